@@ -0,0 +1,113 @@
+
+# compare_backends.py
+"""
+Checks that every PDF backend yields the same page layouts, outlines (1A) and
+parsed sections (1B), and reports how long each backend takes.
+
+    python compare_backends.py                    # sample input + synthetic PDFs
+    python compare_backends.py a.pdf b.pdf ...    # specific files
+
+The exit status is non-zero if any backend disagrees with the reference
+(pdfplumber) backend.
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import tempfile
+import contextlib
+import io
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [os.path.join(ROOT, 'challenge_1a'), os.path.join(ROOT, 'challenge_1b'), HERE]
+
+from synthetic_pdf import build_pdf
+from pdf_backend import BACKENDS, DEFAULT_BACKEND, open_pdf
+from heading_extractor import extract_outline
+from document_parser_1b import parse_document
+
+SAMPLE_INPUT_DIR = os.path.join(ROOT, 'challenge_1b', 'input')
+
+SYNTHETIC_SPECS = [
+    dict(pages=5),
+    dict(pages=8, font_mix=('helvetica', 'times', 'courier'), seed=1),
+    dict(pages=6, headings_per_page=10, header_footer=False, seed=2),
+]
+
+
+def _layout_rows(pdf_path, backend):
+    """Every page's layout as plain tuples, so two backends can be compared with ==."""
+    rows = []
+    with open_pdf(pdf_path, backend) as doc:
+        for layout in doc.iter_layouts():
+            lines = [(l.text, l.size, l.is_bold, l.y_pos, l.end_y) for l in layout.lines]
+            rows.append((layout.page_number, layout.height, lines, dict(layout.size_counts),
+                         dict(layout.fonts), layout.num_chars))
+    return rows
+
+
+def _first_difference(expected, actual):
+    for page_expected, page_actual in zip(expected, actual):
+        if page_expected != page_actual:
+            return f"page {page_expected[0]} differs"
+    return f"{len(expected)} vs {len(actual)} pages"
+
+
+def compare_pdf(pdf_path, backends):
+    """Returns ({backend: seconds}, [problems]) for one PDF."""
+    timings = {}
+    results = {}
+    for backend in backends:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[backend] = (_layout_rows(pdf_path, backend),
+                                extract_outline(pdf_path, backend=backend),
+                                parse_document(pdf_path, backend=backend))
+        timings[backend] = time.perf_counter() - start
+
+    problems = []
+    layouts, outline, parsed = results[DEFAULT_BACKEND]
+    for backend in backends:
+        if backend == DEFAULT_BACKEND:
+            continue
+        other_layouts, other_outline, other_parsed = results[backend]
+        if other_layouts != layouts:
+            problems.append(f"{backend}: layouts differ ({_first_difference(layouts, other_layouts)})")
+        if other_outline != outline:
+            problems.append(f"{backend}: 1A outline differs")
+        if other_parsed != parsed:
+            problems.append(f"{backend}: 1B sections differ")
+    return timings, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check PDF backends for identical output.")
+    parser.add_argument("pdfs", nargs='*', help="PDFs to check (default: sample input plus synthetic PDFs)")
+    args = parser.parse_args()
+
+    backends = [DEFAULT_BACKEND] + sorted(b for b in BACKENDS if b != DEFAULT_BACKEND)
+    failures = 0
+    totals = dict.fromkeys(backends, 0.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_paths = args.pdfs or (
+            sorted(glob.glob(os.path.join(SAMPLE_INPUT_DIR, '*.pdf'))) +
+            [build_pdf(os.path.join(tmp, f"synthetic-{i}.pdf"), **spec) for i, spec in enumerate(SYNTHETIC_SPECS)])
+        for pdf_path in pdf_paths:
+            timings, problems = compare_pdf(pdf_path, backends)
+            for backend, seconds in timings.items():
+                totals[backend] += seconds
+            status = "OK  " if not problems else "FAIL"
+            print(f"{status} {os.path.basename(pdf_path):<48} " +
+                  "  ".join(f"{b} {timings[b]:.2f}s" for b in backends))
+            for problem in problems:
+                print(f"     {problem}")
+            failures += bool(problems)
+
+    print("Total: " + "  ".join(f"{b} {totals[b]:.2f}s" for b in backends))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
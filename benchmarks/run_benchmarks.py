@@ -0,0 +1,213 @@
+
+# run_benchmarks.py
+"""
+Benchmarks extract_outline (1A), parse_document and rank_sections (1B).
+
+Every case runs in a freshly spawned interpreter so its peak RSS is measured
+on its own; a forked child would count the pages it shares with this one. Results can be saved as a baseline and later runs compared against it
+with a relative tolerance; the exit status is non-zero on a regression or
+when the 10 s per 50 pages budget is exceeded.
+
+    python run_benchmarks.py                          # run and print
+    python run_benchmarks.py --save-baseline base.json
+    python run_benchmarks.py --baseline base.json --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import resource
+import tempfile
+import multiprocessing
+import contextlib
+import io
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [os.path.join(ROOT, 'challenge_1a'), os.path.join(ROOT, 'challenge_1b'), HERE]
+
+from synthetic_pdf import build_pdf
+from pdf_backend import BACKENDS, DEFAULT_BACKEND
+
+SAMPLE_INPUT_DIR = os.path.join(ROOT, 'challenge_1b', 'input')
+SAMPLE_PERSONA = "Travel Planner"
+SAMPLE_JOB = "Plan a 4-day trip for 10 college friends to South of France"
+
+# Time budget from the challenge: 10 seconds for a document of up to 50 pages
+BUDGET_SECONDS_PER_PAGE = 10.0 / 50
+
+# name -> build_pdf keyword arguments (documents per case)
+SYNTHETIC_CASES = {
+    'small-10p': [dict(pages=10)],
+    'medium-50p': [dict(pages=50)],
+    'large-200p': [dict(pages=200)],
+    'dense-headings-50p': [dict(pages=50, headings_per_page=12)],
+    'font-mix-50p': [dict(pages=50, font_mix=('helvetica', 'times', 'courier'))],
+    'no-header-footer-50p': [dict(pages=50, header_footer=False)],
+    'collection-8x25p': [dict(pages=25, seed=seed) for seed in range(8)],
+}
+
+# Metrics compared against the baseline (lower is better)
+TIMED_METRICS = ('outline_seconds', 'parse_seconds', 'rank_seconds', 'total_seconds', 'peak_rss_mb')
+
+
+def _page_count(pdf_path):
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _peak_rss_mb():
+    # VmHWM starts afresh with the spawned interpreter; Linux keeps ru_maxrss
+    # across exec, so that would still include the parent's peak
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(pdf_paths, persona, job, backend, conn):
+    """Child process: runs every stage on pdf_paths and sends back the metrics."""
+    from heading_extractor import extract_outline
+    from document_parser_1b import parse_document
+    from relevance_ranker_1b import rank_sections
+
+    pages = sum(_page_count(p) for p in pdf_paths)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        headings = sum(len(extract_outline(p, backend=backend)['outline']) for p in pdf_paths)
+        outlined = time.perf_counter()
+        parsed_documents = []
+        for pdf_path in pdf_paths:
+            parsed_doc = parse_document(pdf_path, backend)
+            parsed_doc['doc_id'] = os.path.basename(pdf_path)
+            parsed_documents.append(parsed_doc)
+        parsed = time.perf_counter()
+        rank_sections(parsed_documents, persona, job)
+        ranked = time.perf_counter()
+
+    sections = sum(len(d['sections']) for d in parsed_documents)
+    outline_seconds = outlined - start
+    parse_seconds = parsed - outlined
+    rank_seconds = ranked - parsed
+    conn.send({
+        'documents': len(pdf_paths),
+        'pages': pages,
+        'headings': headings,
+        'sections': sections,
+        'outline_seconds': round(outline_seconds, 4),
+        'parse_seconds': round(parse_seconds, 4),
+        'rank_seconds': round(rank_seconds, 4),
+        'total_seconds': round(ranked - start, 4),
+        'outline_pages_per_sec': round(pages / outline_seconds, 2) if outline_seconds else None,
+        'parse_pages_per_sec': round(pages / parse_seconds, 2) if parse_seconds else None,
+        'rank_sections_per_sec': round(sections / rank_seconds, 2) if rank_seconds else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    })
+    conn.close()
+
+
+def run_case(pdf_paths, persona="", job=SAMPLE_JOB, backend=DEFAULT_BACKEND):
+    # Spawned, not forked: a forked child's RSS includes the parent's resident pages
+    context = multiprocessing.get_context('spawn')
+    recv_conn, send_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case, args=(pdf_paths, persona, job, backend, send_conn))
+    process.start()
+    send_conn.close()
+    try:
+        return recv_conn.recv()
+    finally:
+        process.join()
+
+
+def run_all(selected=None, workdir=None, backend=DEFAULT_BACKEND):
+    """Generates the synthetic corpus, runs every case and returns {case: metrics}."""
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for name, specs in SYNTHETIC_CASES.items():
+            if selected and name not in selected:
+                continue
+            paths = [build_pdf(os.path.join(tmp, f"{name}-{i}.pdf"), **spec) for i, spec in enumerate(specs)]
+            results[name] = run_case(paths, backend=backend)
+            _print_row(name, results[name])
+        samples = sorted(glob.glob(os.path.join(SAMPLE_INPUT_DIR, '*.pdf')))
+        if samples and (not selected or 'sample-input' in selected):
+            results['sample-input'] = run_case(samples, SAMPLE_PERSONA, SAMPLE_JOB, backend)
+            _print_row('sample-input', results['sample-input'])
+    return results
+
+
+def _print_row(name, m):
+    print(f"{name:<24} {m['pages']:>5}p {m['sections']:>6}s  "
+          f"1A {m['outline_seconds']:>7.2f}s ({m['outline_pages_per_sec']} p/s)  "
+          f"1B parse {m['parse_seconds']:>7.2f}s ({m['parse_pages_per_sec']} p/s)  "
+          f"rank {m['rank_seconds']:>6.2f}s ({m['rank_sections_per_sec']} s/s)  "
+          f"RSS {m['peak_rss_mb']:.0f} MB")
+
+
+def check_budget(results):
+    """
+    Cases whose 1A or 1B time per document exceeds the budget: 10 s for
+    documents of up to 50 pages, scaled linearly beyond that.
+    """
+    failures = []
+    for name, m in results.items():
+        budget = max(50, m['pages'] / m['documents']) * BUDGET_SECONDS_PER_PAGE
+        for stage in ('outline_seconds', 'parse_seconds'):
+            per_doc = m[stage] / m['documents']
+            if per_doc > budget:
+                failures.append(f"{name}: {stage} {per_doc:.2f}s per document exceeds budget {budget:.2f}s")
+    return failures
+
+
+def compare(results, baseline, tolerance):
+    """Metrics that regressed by more than `tolerance` (relative) against the baseline."""
+    regressions = []
+    for name, m in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in TIMED_METRICS:
+            old, new = base.get(metric), m.get(metric)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the 1A/1B parsing and ranking pipeline.")
+    parser.add_argument("--cases", nargs='*', help="Subset of cases to run (default: all)")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against a stored baseline JSON")
+    parser.add_argument("--save-baseline", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown/memory growth before a metric counts as a regression")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="PDF backend used by both parsers")
+    args = parser.parse_args()
+
+    results = run_all(args.cases, backend=args.backend)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    problems = check_budget(results)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            problems += compare(results, json.load(f), args.tolerance)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+
+# synthetic_pdf.py
+"""
+Dependency-free generator of synthetic PDFs for benchmarking the parsers.
+
+Pages are laid out with the 14 standard PDF fonts (no embedding), so the files
+are small and build instantly, while still exercising the full pdfplumber
+layout path: numbered H1/H2/H3 headings in bold, body paragraphs, and optional
+running headers/footers that repeat on every page. Optionally the headings are
+also written as the document's outline (bookmarks).
+"""
+import random
+
+WORDS = (
+    "analysis budget coast culture data design document entry festival guide harbor "
+    "history hotel itinerary journey landmark market museum network overview policy "
+    "process region report review river route schedule section service source summary "
+    "system travel value village vineyard window workshop"
+).split()
+
+# Regular/bold pairs from the standard 14 fonts
+FONT_FAMILIES = {
+    'helvetica': ('Helvetica', 'Helvetica-Bold'),
+    'times': ('Times-Roman', 'Times-Bold'),
+    'courier': ('Courier', 'Courier-Bold'),
+}
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+BODY_SIZE, BODY_LEADING = 10, 14
+HEADING_SIZES = {1: 18, 2: 14, 3: 12}
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _sentence(rng, min_words=8, max_words=16):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def _wrap(text, width=95):
+    lines, current = [], ''
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _page_ops(rng, page_number, num_pages, headings_per_page, fonts, header_footer, counters, headings):
+    """Returns the content-stream operators for one page; its headings are appended to `headings`."""
+    ops = []
+
+    def show(font, size, x, y, text):
+        ops.append(f"BT /{font} {size} Tf {x} {y} Td ({_escape(text)}) Tj ET")
+
+    if header_footer:
+        show('F1', 8, 72, PAGE_HEIGHT - 40, "Synthetic Benchmark Manual - Internal Use Only")
+        show('F1', 8, 72, 30, f"Page {page_number} of {num_pages}")
+
+    y = PAGE_HEIGHT - 80
+    bottom = 60
+    body_lines_between = max(1, int((y - bottom) / BODY_LEADING / max(1, headings_per_page)) - 3)
+    headings_left = headings_per_page
+    while y > bottom:
+        if headings_left > 0:
+            headings_left -= 1
+            level = rng.choice((1, 2, 2, 3, 3, 3)) if counters[0] else 1
+            if level == 1:
+                counters[:] = [counters[0] + 1, 0, 0]
+                number = f"{counters[0]}."
+            elif level == 2:
+                counters[1] += 1
+                counters[2] = 0
+                number = f"{counters[0]}.{counters[1]}"
+            else:
+                counters[2] += 1
+                number = f"{counters[0]}.{counters[1]}.{counters[2]}"
+            title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+            size = HEADING_SIZES[level]
+            y -= size
+            show('F2', size, 72, y, f"{number} {title}")
+            headings.append((level, f"{number} {title}", page_number, y + size))
+            y -= 8
+
+        font = rng.choice(fonts)
+        paragraph = ' '.join(_sentence(rng) for _ in range(rng.randint(2, 5)))
+        for line in _wrap(paragraph)[:body_lines_between]:
+            if y <= bottom:
+                break
+            y -= BODY_LEADING
+            show(font, BODY_SIZE, 72, y, line)
+        y -= 6
+    return '\n'.join(ops)
+
+
+def _outline_objects(add, objects, headings, page_objs):
+    """Adds an outline tree mirroring `headings` (nested by level); returns the root object number."""
+    root = add(None)
+    items = [add(None) for _ in headings]
+    parents, children = {}, {root: []}
+    stack = [(0, root)]  # (level, item) of the open ancestors
+    for item, (level, _, _, _) in zip(items, headings):
+        while stack[-1][0] >= level:
+            stack.pop()
+        parents[item] = stack[-1][1]
+        children[stack[-1][1]].append(item)
+        children[item] = []
+        stack.append((level, item))
+    for item, (_, text, page_number, y) in zip(items, headings):
+        siblings = children[parents[item]]
+        i = siblings.index(item)
+        links = f"/Parent {parents[item]} 0 R"
+        if i > 0:
+            links += f" /Prev {siblings[i - 1]} 0 R"
+        if i + 1 < len(siblings):
+            links += f" /Next {siblings[i + 1]} 0 R"
+        if children[item]:
+            links += f" /First {children[item][0]} 0 R /Last {children[item][-1]} 0 R /Count {len(children[item])}"
+        objects[item - 1] = (f"<< /Title ({_escape(text)}) {links} "
+                             f"/Dest [{page_objs[page_number - 1]} 0 R /XYZ 72 {y} null] >>")
+    top = children[root]
+    objects[root - 1] = (f"<< /Type /Outlines /First {top[0]} 0 R /Last {top[-1]} 0 R /Count {len(top)} >>"
+                         if top else "<< /Type /Outlines /Count 0 >>")
+    return root
+
+
+def build_pdf(path, pages=10, headings_per_page=3, font_mix=('helvetica',), header_footer=True, seed=0,
+              bookmarks=False, title=None):
+    """
+    Writes a synthetic PDF to `path`.
+
+    pages: page count; headings_per_page: heading density; font_mix: body font
+    families picked at random per paragraph (headings always use the first
+    family's bold face); header_footer: add a running header and "Page N of M"
+    footer; seed: makes the output reproducible; bookmarks: also write the
+    headings as the document outline; title: document information Title.
+    """
+    rng = random.Random(seed)
+    families = [FONT_FAMILIES[name] for name in font_mix]
+    base_fonts = [families[0][0], families[0][1]] + [face for family in families[1:] for face in family]
+    font_names = [f"F{i + 1}" for i in range(len(base_fonts))]
+    body_fonts = [font_names[0]] + font_names[2::2]
+
+    objects = []  # index i holds object number i + 1
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    pages_obj = add(None)
+    font_objs = [add(f"<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>")
+                 for name in base_fonts]
+    resources = "<< /Font << " + ' '.join(f"/{n} {o} 0 R" for n, o in zip(font_names, font_objs)) + " >> >>"
+
+    counters = [0, 0, 0]
+    headings = []
+    page_objs = []
+    for page_number in range(1, pages + 1):
+        stream = _page_ops(rng, page_number, pages, headings_per_page, body_fonts, header_footer, counters, headings)
+        data = stream.encode('latin-1')
+        content = add(f"<< /Length {len(data)} >>\nstream\n{stream}\nendstream")
+        page_objs.append(add(f"<< /Type /Page /Parent {pages_obj} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                             f"/Resources {resources} /Contents {content} 0 R >>"))
+
+    outlines = f" /Outlines {_outline_objects(add, objects, headings, page_objs)} 0 R" if bookmarks else ""
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_obj} 0 R{outlines} >>"
+    info = add(f"<< /Title ({_escape(title)}) >>") if title else None
+    objects[pages_obj - 1] = (f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_objs)}] "
+                              f"/Count {len(page_objs)} >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode('latin-1')
+    info_ref = f" /Info {info} 0 R" if info else ""
+    out += (f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R{info_ref} >>\nstartxref\n{xref}\n%%EOF\n"
+            .encode('latin-1'))
+
+    with open(path, 'wb') as f:
+        f.write(out)
+    return path
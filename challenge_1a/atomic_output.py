@@ -0,0 +1,113 @@
+
+# atomic_output.py
+import os
+import json
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+_umask = None
+_umask_lock = threading.Lock()
+
+
+def _process_umask():
+    """
+    The process umask, read once. Linux reports it in /proc without changing
+    it; elsewhere it can only be read by setting it, which is done under a lock.
+    """
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            try:
+                with open('/proc/self/status', 'r') as f:
+                    for line in f:
+                        if line.startswith('Umask:'):
+                            _umask = int(line.split()[1], 8)
+            except (OSError, ValueError):
+                pass
+            if _umask is None:
+                _umask = os.umask(0o022)
+                os.umask(_umask)
+        return _umask
+
+
+def set_file_mode(fd, path):
+    """
+    Gives a file made by tempfile.mkstemp, which is private to its owner, the
+    permissions of the file at `path` it is about to replace, or if there is
+    none, those open() would have created it with (0o666 less the umask).
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = 0o666 & ~_process_umask()
+    os.fchmod(fd, mode)
+
+
+@contextmanager
+def atomic_open(path, encoding='utf-8'):
+    """
+    Text file for writing that only appears at `path`, replacing any earlier
+    version, once the block completes; readers never see a partial file. If
+    the block raises, the partial file is discarded and `path` is untouched.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        set_file_mode(fd, path)
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_json(path, data):
+    """Writes `data` as indented JSON to `path`, atomically."""
+    with atomic_open(path) as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+class NDJSONWriter:
+    """
+    Writes records as compact JSON lines while they are produced, so none of
+    them has to be held until the end. The file replaces `path` atomically
+    when the writer is closed without error.
+
+    `carry_over`, if given, is a predicate over the records already in `path`:
+    those it accepts are copied into the new file first (streamed, not loaded),
+    which lets an incremental run replace only some of the records.
+    """
+
+    def __init__(self, path, carry_over=None):
+        self.path = path
+        self.count = 0
+        self._context = atomic_open(path)
+        self._file = self._context.__enter__()
+        if carry_over is not None and os.path.exists(path):
+            try:
+                self._carry_over(carry_over)
+            except BaseException as e:
+                self._context.__exit__(type(e), e, e.__traceback__)
+                raise
+
+    def _carry_over(self, keep):
+        with open(self.path, 'r', encoding='utf-8') as old:
+            for line in old:
+                if line.strip() and keep(json.loads(line)):
+                    self._file.write(line if line.endswith('\n') else line + '\n')
+                    self.count += 1
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.count += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._context.__exit__(*exc)
+        return False
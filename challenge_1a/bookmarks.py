@@ -0,0 +1,130 @@
+
+# bookmarks.py
+import re
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdftypes import PDFObjRef, resolve1
+from pdfminer.psparser import PSLiteral
+from pdfminer.utils import decode_text
+
+# Bookmark nesting depth -> outline level; deeper entries are left out
+DEPTH_LEVELS = {1: "H1", 2: "H2", 3: "H3"}
+# An outline is only trusted with at least this many usable entries...
+MIN_BOOKMARKS = 2
+# ...of which at least this share point to a page of the document
+MIN_RESOLVED_SHARE = 0.9
+
+
+def _text(value):
+    value = resolve1(value)
+    if isinstance(value, bytes):
+        value = decode_text(value)
+    return re.sub(r'\s+', ' ', value).strip() if isinstance(value, str) else ""
+
+
+def _iter_outline_items(doc):
+    """(depth, item dict) for every outline item in reading order, without recursion and safe against cycles."""
+    root = resolve1(doc.catalog.get('Outlines'))
+    if not isinstance(root, dict):
+        return
+    stack = [(root.get('First'), 1)]
+    seen = set()
+    while stack:
+        ref, depth = stack.pop()
+        if isinstance(ref, PDFObjRef):
+            if ref.objid in seen:
+                continue
+            seen.add(ref.objid)
+        item = resolve1(ref)
+        if not isinstance(item, dict):
+            continue
+        yield depth, item
+        # Children come before the next sibling
+        stack.append((item.get('Next'), depth))
+        stack.append((item.get('First'), depth + 1))
+
+
+def _destination(doc, item):
+    """The target of an outline item's destination (directly or through a GoTo action): a page reference, a page index, or None."""
+    dest = item.get('Dest')
+    if dest is None:
+        action = resolve1(item.get('A'))
+        if isinstance(action, dict) and getattr(resolve1(action.get('S')), 'name', None) == 'GoTo':
+            dest = action.get('D')
+    dest = resolve1(dest)
+    if isinstance(dest, (bytes, PSLiteral)):  # A named destination
+        try:
+            dest = resolve1(doc.get_dest(dest.name if isinstance(dest, PSLiteral) else dest))
+        except Exception:
+            return None
+    if isinstance(dest, dict):
+        dest = resolve1(dest.get('D'))
+    if not isinstance(dest, list) or not dest:
+        return None
+    return dest[0]
+
+
+def _page_numbers(doc, known_pages):
+    """
+    1-based page number of every page object (by object id), in page tree
+    order. Objects in known_pages are destinations and so are taken to be
+    pages without parsing them; only the other nodes of the tree are read.
+    """
+    numbers = {}
+    stack = [doc.catalog.get('Pages')]
+    seen = set()
+    while stack:
+        ref = stack.pop()
+        objid = ref.objid if isinstance(ref, PDFObjRef) else None
+        if objid in known_pages:
+            numbers.setdefault(objid, len(numbers) + 1)
+            continue
+        if objid is not None:
+            if objid in seen:
+                continue
+            seen.add(objid)
+        node = resolve1(ref)
+        if not isinstance(node, dict):
+            continue
+        kids = resolve1(node.get('Kids'))
+        if isinstance(kids, list):
+            stack.extend(reversed(kids))
+        elif objid is not None:
+            numbers[objid] = len(numbers) + 1
+    return numbers
+
+
+def read_bookmarks(pdf_path):
+    """
+    The outline from the PDF's own bookmarks, in the extract_outline schema:
+    nesting depths 1-3 become H1-H3 and destinations are resolved to page
+    numbers. The title comes from the document information. Only the
+    document structure is read, no page content, so this takes milliseconds.
+
+    Returns None when the PDF has no bookmarks or they are not good enough:
+    fewer than MIN_BOOKMARKS usable entries, or less than MIN_RESOLVED_SHARE
+    of them pointing to a page. Entries that don't resolve are left out.
+    """
+    with open(pdf_path, 'rb') as f:
+        doc = PDFDocument(PDFParser(f))
+        entries = [(DEPTH_LEVELS[depth], _text(item.get('Title')), item)
+                   for depth, item in _iter_outline_items(doc) if depth in DEPTH_LEVELS]
+        entries = [entry for entry in entries if entry[1]]
+        if len(entries) < MIN_BOOKMARKS:
+            return None
+        targets = [_destination(doc, item) for _, _, item in entries]
+        page_numbers = _page_numbers(doc, {t.objid for t in targets if isinstance(t, PDFObjRef)})
+        outline = []
+        for (level, text, _), target in zip(entries, targets):
+            if isinstance(target, PDFObjRef):
+                page = page_numbers.get(target.objid)
+            elif isinstance(target, int) and 0 <= target < len(page_numbers):
+                page = target + 1
+            else:
+                page = None
+            if page is not None:
+                outline.append({'level': level, 'text': text, 'page': page})
+        if len(outline) < max(MIN_BOOKMARKS, MIN_RESOLVED_SHARE * len(entries)):
+            return None
+        info = doc.info[0] if doc.info else {}
+        return {"title": _text(info.get('Title')), "outline": outline}
@@ -1,181 +1,366 @@
 
 # heading_extractor.py
-import pdfplumber
 import re
-from collections import defaultdict, Counter
-import statistics
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from page_layout import (FontStatistics, HeaderFooterDetector, header_footer_key, iter_page_layouts,
+                         sample_page_indices, bootstrap_stderr)
+from pdf_backend import DEFAULT_BACKEND, open_pdf
+from deadline import Deadline
+from bookmarks import read_bookmarks
+from keyword_matcher import load_matcher, NUMBERED_DOT, DEPTH_2, DEPTH_3, CAPITALIZED, TITLED
+import instrumentation
+from instrumentation import count, stage
 
-def extract_outline(pdf_path):
+# Bump whenever a change alters extract_outline's output; invalidates cached results
+PARSER_VERSION = 3
+
+# Below this many pages per shard, process start-up outweighs the parallel gain
+MIN_PAGES_PER_SHARD = 25
+
+
+# Text pattern kinds for candidate lines (checked in this order)
+NO_PATTERN, H1_PATTERN, H2_H3_PATTERN, KEYWORD_PATTERN = 0, 1, 2, 3
+PATTERN_BONUS = np.array([0.0, 2.0, 1.5, 1.5])
+PATTERN_FEATURES = [None, "H1Pattern", "H2/H3Pattern", "Keyword"]
+
+# Vocabularies of the keyword file (see keyword_matcher) used here: common
+# section title keywords, and generic ones that make a poor document title
+SECTION_TITLES = 'section_titles'
+GENERIC_TITLES = 'generic_titles'
+
+# Numbering -> level, checked in this order
+LEVEL_FLAGS = [
+    (NUMBERED_DOT, "H1"), # e.g., "1. Title"
+    (DEPTH_2, "H2"), # e.g., "2.1 Sub"
+    (DEPTH_3, "H3"), # e.g., "3.1.1 SubSub"
+]
+
+
+def _pattern_kind(flags, matcher):
+    """Pattern kind of a line from its keyword_matcher flags."""
+    if flags & NUMBERED_DOT and flags & TITLED: # e.g., "1. Introduction"
+        return H1_PATTERN
+    if flags & (DEPTH_2 | DEPTH_3) and flags & CAPITALIZED: # e.g., "2.1 Details", "3.1.1 More"
+        return H2_H3_PATTERN
+    if flags & matcher.flag(SECTION_TITLES):
+        return KEYWORD_PATTERN
+    return NO_PATTERN
+
+
+def score_lines(sizes, bold_flags, positions, pattern_kinds, heading_size_threshold, median_text_size):
+    """
+    Heading score for every candidate line at once. Inputs are equal-length
+    arrays; weights are added in the same order as the original per-line loop
+    so the scores are bit-for-bit identical.
+    """
+    scores = np.zeros(len(sizes))
+    # 1. Font Size (PRIMARY FACTOR): score based on how much larger it is
+    large = sizes >= heading_size_threshold
+    scores[large] += (sizes[large] - heading_size_threshold) / median_text_size * 3.0 # Strong weight
+    # 2. Bold Font (PRIMARY FACTOR)
+    scores[bold_flags] += 2.5 # Strong weight
+    # 3. Position (SECONDARY FACTOR): avoid extreme top/bottom (often headers/footers)
+    scores[(positions > 0.1) & (positions < 0.9)] += 0.5
+    # 4. Text Patterns (SECONDARY FACTOR - Boosts score if present)
+    has_pattern = pattern_kinds != NO_PATTERN
+    scores[has_pattern] += PATTERN_BONUS[pattern_kinds[has_pattern]]
+    return scores
+
+
+def _features(size, is_bold, position, pattern_kind, heading_size_threshold):
+    """Human-readable list of the factors that contributed to a heading's score."""
+    features = []
+    if size >= heading_size_threshold:
+        features.append(f"Large({size:.1f})")
+    if is_bold:
+        features.append("Bold")
+    if 0.1 < position < 0.9:
+        features.append("MidPos")
+    if pattern_kind != NO_PATTERN:
+        features.append(PATTERN_FEATURES[pattern_kind])
+    return features
+
+
+def assign_levels(line_flags, scores, sizes):
+    """
+    H1/H2/H3 for each heading: numbering depth first (from the keyword_matcher
+    flags its line was classified with), otherwise a combined score/size
+    metric normalised over the whole pool of headings (the pool's min/max are
+    computed once, not per heading).
+    """
+    score_range = scores.max() - scores.min() if scores.max() != scores.min() else 1
+    size_range = sizes.max() - sizes.min() if sizes.max() != sizes.min() else 1
+    norm_score = (scores - scores.min()) / score_range
+    norm_size = (sizes - sizes.min()) / size_range
+    # Combined heuristic for level if no clear pattern matched
+    combined_metric = (norm_score * 0.6) + (norm_size * 0.4)
+    fallback = np.where(combined_metric > 0.7, "H1", np.where(combined_metric > 0.4, "H2", "H3"))
+
+    levels = []
+    for flags, fallback_level in zip(line_flags, fallback):
+        for flag, level in LEVEL_FLAGS:
+            if flags & flag:
+                break
+        else:
+            level = str(fallback_level)
+        levels.append(level)
+    return levels
+
+
+def _is_candidate_line(text):
+    """Heading filters that don't depend on document-wide statistics."""
+    return len(text) >= 3 and \
+           not re.match(r'^\d+$', text) and \
+           '......' not in text and \
+           len(text) <= 150 # Too long, likely body text or TOC line
+
+
+def summarize_pages(pdf_path, start=0, end=None, backend=DEFAULT_BACKEND, sample=None, deadline=None):
+    """
+    PASS 1 over pages[start:end]: runs layout once per page and returns the
+    shard's partial statistics plus its per-page candidate lines. Shards of
+    one document can be computed independently and combined with
+    merge_summaries(). `backend` names the PDF backend (see pdf_backend).
+    With `sample` (0-based page indices), only those pages feed the font
+    statistics and the header/footer counts; every page still yields its
+    candidate lines. A `deadline` (see deadline.Deadline) may skip the later
+    pages; it is kept in the summary.
+    """
+    deadline = deadline or Deadline()
+    stats = FontStatistics()
+    header_footer = HeaderFooterDetector()
+    layouts = []
+    sample = set(sample) if sample is not None else None
+    sampled_size_counts = []
+    stat_pages = 0
+    with stage('open'):
+        doc = open_pdf(pdf_path, backend)
+    with doc:
+        pages = iter_page_layouts(doc, None, start, end)
+        if deadline.budget is not None:
+            pages = deadline.iter_pages(pages, min(doc.num_pages, end or doc.num_pages) - start)
+        for layout in pages:
+            if sample is None or layout.page_number - 1 in sample:
+                stats.add_page(layout)
+                stat_pages += 1
+                if sample is not None:
+                    sampled_size_counts.append(layout.size_counts)
+                with stage('header_footer'):
+                    header_footer.add_page(layout)
+            layout.lines = [line for line in layout.lines if _is_candidate_line(line.text)]
+            layouts.append(layout)
+    return {"stats": stats, "header_footer": header_footer, "layouts": layouts, "stat_pages": stat_pages,
+            "sampled_size_counts": sampled_size_counts if sample is not None else None, "deadline": deadline}
+
+
+def merge_summaries(summaries):
+    """Combines shard summaries (in page order) into one document summary."""
+    stats = FontStatistics()
+    header_footer = HeaderFooterDetector()
+    layouts = []
+    stat_pages = 0
+    sampled_size_counts = None
+    deadline = Deadline()
+    for summary in summaries:
+        stats.merge(summary["stats"])
+        header_footer.merge(summary["header_footer"])
+        layouts.extend(summary["layouts"])
+        stat_pages += summary["stat_pages"]
+        if summary["sampled_size_counts"] is not None:
+            sampled_size_counts = (sampled_size_counts or []) + summary["sampled_size_counts"]
+        deadline.merge(summary["deadline"])
+    return {"stats": stats, "header_footer": header_footer, "layouts": layouts, "stat_pages": stat_pages,
+            "sampled_size_counts": sampled_size_counts, "deadline": deadline}
+
+
+def _summarize_shard(args):
+    return summarize_pages(*args)
+
+
+def _page_ranges(num_pages, shards):
+    size = -(-num_pages // shards)
+    return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+
+def extract_outline(pdf_path, workers=1, backend=DEFAULT_BACKEND, sample_size=None, sample_seed=0,
+                    time_budget=None, bookmarks=False, keywords=None):
     """
     Extracts title and structured outline (H1, H2, H3) from a PDF using general heuristics.
     Focuses on font size, boldness, position, and common heading patterns.
+    With workers > 1, long documents are split into contiguous page ranges that
+    are summarized in parallel; the result is identical to the sequential path.
+    `backend` selects the PDF backend; all backends give the same outline.
+    With sample_size, the size thresholds and header/footer lines are derived
+    from a stratified sample of that many pages (seeded by sample_seed) and
+    their bootstrap standard errors go to the metrics record; headings are
+    still scored on every page.
+    With a time_budget (seconds), the pages that would no longer be laid out
+    in time are skipped (see deadline.Deadline). The outline is then still
+    valid but partial, and carries a "degraded" entry with the number of
+    skipped pages; degraded outlines are not cached.
+    With bookmarks, the PDF's own outline (see bookmarks.read_bookmarks) is
+    tried first. If it is usable it is returned as is, marked with
+    "source": "bookmarks", and no page is laid out, except page 1 to pick a
+    title when the document information has none. Otherwise the heuristic
+    runs as usual. The path taken is also noted in the metrics record.
+    `keywords` is a vocabulary file for the keyword patterns (see
+    keyword_matcher.load_matcher); by default the bundled keywords.json.
+    """
+    if bookmarks:
+        with stage('bookmarks'):
+            outline = read_bookmarks(pdf_path)
+        instrumentation.note('outline_source', 'bookmarks' if outline else 'layout')
+        if outline is not None:
+            count('bookmarks', len(outline["outline"]))
+            if not outline["title"]:
+                # No title in the document information: pick one from page 1 as the heuristic would
+                outline["title"] = build_outline(summarize_pages(pdf_path, 0, 1, backend), keywords)["title"]
+            outline["source"] = "bookmarks"
+            return outline
+
+    deadline = Deadline(time_budget)
+    shards = 1
+    sample = None
+    if workers > 1 or sample_size:
+        with open_pdf(pdf_path, backend) as doc:
+            num_pages = doc.num_pages
+        shards = min(workers, num_pages // MIN_PAGES_PER_SHARD)
+        sample = sample_page_indices(num_pages, sample_size, sample_seed)
+
+    if shards > 1:
+        ranges = [(pdf_path, start, end, backend, sample, deadline)
+                  for start, end in _page_ranges(num_pages, shards)]
+        # Shards run in other processes, so only their combined wall time is recorded here
+        with stage('shards'), ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            summary = merge_summaries(executor.map(_summarize_shard, ranges))
+        count('pages', len(summary["layouts"]))
+        deadline.merge(summary["deadline"])
+    else:
+        summary = summarize_pages(pdf_path, backend=backend, sample=sample, deadline=deadline)
+
+    outline = build_outline(summary, keywords)
+    degraded = deadline.report()
+    if degraded:
+        outline["degraded"] = degraded
+        instrumentation.note('degraded', degraded)
+    return outline
+
+
+def size_thresholds(stats):
+    """(median text size, heading size threshold) from a document's FontStatistics."""
+    median_text_size = stats.median()
+    # Define a threshold for "large" text (potential headings)
+    # Use 75th percentile or a multiplier, whichever is larger, to be adaptive
+    size_threshold_75 = stats.percentile(0.75)
+    size_threshold_multiplier = median_text_size * 1.2
+    return median_text_size, max(size_threshold_75, size_threshold_multiplier)
+
+
+def _note_sampling_error(summary):
+    """Reports the sample size and the bootstrap standard errors of the sampled thresholds."""
+    page_size_counts = [counts for counts in summary["sampled_size_counts"] if counts]
+    instrumentation.note('sample_pages', summary["stat_pages"])
+    instrumentation.note('median_size_stderr', bootstrap_stderr(page_size_counts, lambda s: size_thresholds(s)[0]))
+    instrumentation.note('heading_threshold_stderr', bootstrap_stderr(page_size_counts, lambda s: size_thresholds(s)[1]))
+
+
+def build_outline(summary, keywords=None):
+    """
+    Merge step: derives the global thresholds and header/footer lines from a
+    document summary, then scores its candidate lines into the final outline.
+    Each candidate line is classified once by the keyword matcher for
+    `keywords`; scoring, levels and the title all use those flags.
     """
     title = ""
     outline = []
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        # --- PASS 1: Collect Global Font Statistics and Detect Headers/Footers ---
-        all_chars = []
-        page_texts = []
-        for page in pdf.pages:
-            all_chars.extend(page.chars)
-            text = page.extract_text()
-            if text:
-                page_texts.append(text)
-
-        if not all_chars:
-            return {"title": "", "outline": []}
-
-        # Font/Size Stats
-        sizes = [c['size'] for c in all_chars if c['size'] > 0]
-        if not sizes:
-             return {"title": "", "outline": []}
-        median_text_size = statistics.median(sizes)
-        # Define a threshold for "large" text (potential headings)
-        # Use 75th percentile or a multiplier, whichever is larger, to be adaptive
-        size_threshold_75 = sorted(sizes)[int(len(sizes) * 0.75)]
-        size_threshold_multiplier = median_text_size * 1.2
-        heading_size_threshold = max(size_threshold_75, size_threshold_multiplier)
-
-        # Font analysis for boldness
-        fonts = [c['fontname'] for c in all_chars]
-        font_counter = Counter(fonts)
-        bold_indicators = ['Bold', 'bold', 'Black', 'black', 'Heavy', 'heavy', 'Semibold', 'SemiBold']
-        bold_fonts = {f for f in font_counter if any(b in f for b in bold_indicators)}
-
-        # Header/Footer Detection (content that repeats across many pages)
-        line_counter = defaultdict(int)
-        for text_content in page_texts:
-            lines = text_content.split('\n')
-            # Count unique lines per page to avoid skew from repetition within a page
-            unique_lines_on_page = set(line.strip() for line in lines if len(line.strip()) > 5 and not re.match(r'^[\d\s\-\.\|]*$', line.strip()))
-            for line in unique_lines_on_page:
-                line_counter[line] += 1
-        num_pages = len(pdf.pages)
-        # Candidate headers/footers appear on a significant portion of pages
-        header_footer_lines = {line for line, count in line_counter.items() if count > max(2, num_pages * 0.3)}
-
-
-        # --- PASS 2: Extract Potential Headings ---
-        potential_headings = []
-        for page_num, page in enumerate(pdf.pages, start=1):
-            lines = page.extract_text_lines()
-            for line_obj in lines:
-                text = line_obj.get('text', '').strip()
-                if not text or len(text) < 3:
-                    continue
+    stats = summary["stats"]
+    header_footer = summary["header_footer"]
+    layouts = summary["layouts"]
+    # Pages the statistics were gathered from: all of them, or the sample
+    num_pages = summary.get("stat_pages", len(layouts))
 
-                # Filter out likely headers/footers and obvious non-headings
-                if text in header_footer_lines or \
-                   re.match(r'^\d+$', text) or \
-                   '......' in text or \
-                   len(text) > 150: # Too long, likely body text or TOC line
-                    continue
+    if not stats.num_chars:
+        return {"title": "", "outline": []}
+
+    # Font/Size Stats
+    if not stats.num_sizes:
+         return {"title": "", "outline": []}
+    median_text_size, heading_size_threshold = size_thresholds(stats)
+    if summary.get("sampled_size_counts") is not None and instrumentation.is_enabled():
+        _note_sampling_error(summary)
 
-                line_chars = line_obj.get('chars', [])
-                if not line_chars:
+    # Header/Footer Detection (content that repeats across many pages)
+    # Candidate headers/footers appear in the same margin on a significant portion of pages
+    header_footer_keys = header_footer.repeated(num_pages, 0.3)
+    matcher = load_matcher(keywords)
+    generic_title = matcher.flag(GENERIC_TITLES)
+
+
+    # --- PASS 2: Collect Candidate Line Features into Columns ---
+    with stage('scoring'):
+        texts = []
+        pages = []
+        sizes = []
+        bold_flags = []
+        positions = []
+        line_flags = []
+        pattern_kinds = []
+        for layout in layouts:
+            for line in layout.lines:
+                text = line.text
+                # Obvious non-headings were dropped per shard; now filter likely headers/footers
+                if header_footer_keys and header_footer_key(line) in header_footer_keys:
                     continue
+                texts.append(text)
+                pages.append(layout.page_number)
+                sizes.append(line.size)
+                bold_flags.append(line.is_bold)
+                positions.append(line.y_pos) # Normalized position: 0=top, 1=bottom
+                flags = matcher.classify(text)
+                line_flags.append(flags)
+                pattern_kinds.append(_pattern_kind(flags, matcher))
+
+        potential_headings = []
+        if texts:
+            pages = np.array(pages)
+            sizes = np.array(sizes, dtype=float)
+            positions = np.array(positions, dtype=float)
+            pattern_kinds = np.array(pattern_kinds)
+            scores = score_lines(sizes, np.array(bold_flags), positions, pattern_kinds,
+                                 heading_size_threshold, median_text_size)
 
-                avg_size = sum(c['size'] for c in line_chars) / len(line_chars)
-                is_bold = any(c['fontname'] in bold_fonts for c in line_chars)
-                # Normalize position: 0=top, 1=bottom
-                y_pos_norm = 1.0 - (line_chars[0]['y0'] / page.height) if page.height > 0 else 0
-
-                # --- Scoring based on key factors ---
-                score = 0
-                features = []
-
-                # 1. Font Size (PRIMARY FACTOR)
-                if avg_size >= heading_size_threshold:
-                    # Score based on how much larger it is
-                    size_factor = (avg_size - heading_size_threshold) / median_text_size
-                    score += size_factor * 3.0 # Strong weight
-                    features.append(f"Large({avg_size:.1f})")
-
-                # 2. Bold Font (PRIMARY FACTOR)
-                if is_bold:
-                    score += 2.5 # Strong weight
-                    features.append("Bold")
-
-                # 3. Position (SECONDARY FACTOR)
-                # Headings often appear in the main content area
-                if 0.1 < y_pos_norm < 0.9: # Avoid extreme top/bottom (often headers/footers)
-                     score += 0.5
-                     features.append("MidPos")
-
-                # 4. Text Patterns (SECONDARY FACTOR - Boosts score if present)
-                # Strong indicators for H1/H2 based on numbering
-                if re.match(r"^\d+\.\s+[A-Z][\w\s]{2,}", text): # e.g., "1. Introduction"
-                    score += 2.0
-                    features.append("H1Pattern")
-                elif re.match(r"^\d+\.\d+(\.\d+)?\s+[A-Z]", text): # e.g., "2.1 Details", "3.1.1 More"
-                    score += 1.5
-                    features.append("H2/H3Pattern")
-                # Common section title keywords (case-insensitive)
-                elif re.search(r"\b(Acknowledgements|Table of Contents|Revision History|References|Introduction|Overview|Abstract|Conclusion|Appendix|Bibliography|Index|Glossary|Copyright|Version|Syllabus|Business Outcomes|Content|Authors|Internal Reviewers|Intended Audience|Career Paths|Learning Objectives|Entry Requirements|Structure|Keeping It Current|Documents|Trademarks)\b", text, re.IGNORECASE):
-                    score += 1.5
-                    features.append("Keyword")
-
-                # Filter based on score to ensure it's likely a heading
-                # This threshold balances inclusion and noise reduction
-                if score >= 2.0:
-                    potential_headings.append({
-                        'text': text,
-                        'page': page_num,
-                        'score': score,
-                        'size': avg_size,
-                        'is_bold': is_bold,
-                        'position': y_pos_norm, # 0=top, 1=bottom
-                        'features': features
-                    })
-
-        # --- Process and Assign Levels ---
-        if potential_headings:
+            # Filter based on score to ensure it's likely a heading
+            # This threshold balances inclusion and noise reduction
+            selected = np.flatnonzero(scores >= 2.0)
             # Sort by page and position (top to bottom within a page)
-            potential_headings.sort(key=lambda x: (x['page'], -x['position']))
-
-            # Assign levels primarily based on numbering pattern depth
-            for heading in potential_headings:
-                text = heading['text']
-
-                # Determine level based on strong numbering patterns first
-                if re.match(r"^\d+\.\s", text): # e.g., "1. Title"
-                    level = "H1"
-                elif re.match(r"^\d+\.\d+\s", text): # e.g., "2.1 Sub"
-                    level = "H2"
-                elif re.match(r"^\d+\.\d+\.\d+\s", text): # e.g., "3.1.1 SubSub"
-                    level = "H3"
-                else:
-                    # Fallback: Assign level based on relative characteristics
-                    # within the pool of identified headings
-                    scores = [h['score'] for h in potential_headings]
-                    sizes_h = [h['size'] for h in potential_headings]
-                    
-                    max_score = max(scores) if scores else 1
-                    min_score = min(scores) if scores else 0
-                    score_range = max_score - min_score if max_score != min_score else 1
-                    
-                    max_size_h = max(sizes_h) if sizes_h else 1
-                    min_size_h = min(sizes_h) if sizes_h else 0
-                    size_range_h = max_size_h - min_size_h if max_size_h != min_size_h else 1
-
-                    norm_score = (heading['score'] - min_score) / score_range if score_range > 0 else 0.5
-                    norm_size = (heading['size'] - min_size_h) / size_range_h if size_range_h > 0 else 0.5
-
-                    # Combined heuristic for level if no clear pattern matched
-                    combined_metric = (norm_score * 0.6) + (norm_size * 0.4)
-
-                    if combined_metric > 0.7:
-                        level = "H1"
-                    elif combined_metric > 0.4:
-                        level = "H2"
-                    else:
-                        level = "H3"
+            selected = selected[np.lexsort((-positions[selected], pages[selected]))]
+            for i in selected:
+                potential_headings.append({
+                    'text': texts[i],
+                    'page': int(pages[i]),
+                    'score': float(scores[i]),
+                    'size': float(sizes[i]),
+                    'is_bold': bool(bold_flags[i]),
+                    'position': float(positions[i]), # 0=top, 1=bottom
+                    'flags': line_flags[i],
+                    'features': _features(sizes[i], bold_flags[i], positions[i], pattern_kinds[i],
+                                          heading_size_threshold)
+                })
+
+    count('candidates', len(texts))
 
+    # --- Process and Assign Levels ---
+    if potential_headings:
+        with stage('levels'):
+            levels = assign_levels([h['flags'] for h in potential_headings],
+                                   scores[selected], sizes[selected])
+            for heading, level in zip(potential_headings, levels):
                 outline.append({
                     'level': level,
-                    'text': text,
-                    'page': heading['page']
+                    'text': heading['text'],
+                    'page': heading['page'],
+                    'flags': heading['flags']  # For the title; removed before returning
                 })
 
             # --- Post-process Outline ---
@@ -202,11 +387,13 @@ def extract_outline(pdf_path):
                     cleaned_outline.append(current)
             outline = cleaned_outline
 
+    if potential_headings:
+        with stage('title'):
             # --- Assign Title ---
             # Best candidate is usually a prominent H1 or a large/bold item on early pages
             # that doesn't look like a generic section name.
             title_candidates = [h for h in outline if h['level'] == 'H1']
-            
+
             # If no strong H1s found, look among potential headings for prominent early ones
             if not title_candidates:
                  early_prominent = [h for h in potential_headings if h['page'] <= 2]
@@ -214,7 +401,7 @@ def extract_outline(pdf_path):
                  # Filter out obvious section names
                  title_candidates_raw = [
                      h for h in early_prominent 
-                     if not re.search(r"\b(Table of Contents|Revision History|Copyright|Version)\b", h['text'], re.IGNORECASE) and
+                     if not h['flags'] & generic_title and
                         len(h['text']) > 10 # Avoid very short generic text
                  ]
                  if title_candidates_raw:
@@ -227,7 +414,7 @@ def extract_outline(pdf_path):
                 # Avoid picking generic "Table of Contents" etc. if better options exist
                 non_generic_candidates = [
                     h for h in title_candidates
-                    if not re.search(r"\b(Table of Contents|Revision History|Copyright|Version)\b", h['text'], re.IGNORECASE) and
+                    if not h['flags'] & generic_title and
                        len(h['text']) > 10
                 ]
                 if non_generic_candidates:
@@ -236,9 +423,10 @@ def extract_outline(pdf_path):
                 else:
                     title = title_candidates[0]['text'] # Take the first one if no better found
 
+    for item in outline:
+        del item['flags']
+    count('headings', len(outline))
     return {
         "title": title.strip(),
         "outline": outline
     }
-
-
@@ -0,0 +1,145 @@
+
+# instrumentation.py
+import os
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager, nullcontext
+from atomic_output import atomic_open
+
+# Off by default: stage() then hands back a shared no-op context manager and
+# count() returns immediately, so instrumented code pays one global lookup.
+_enabled = False
+_profile_dir = None
+_records = []
+_lock = threading.Lock()
+_state = threading.local()
+_NULL_STAGE = nullcontext()
+
+
+def configure(enabled=True, profile_dir=None):
+    """
+    Turns metric collection on or off and starts a fresh collection (a forked
+    worker thus drops the records it inherited). With profile_dir, also dumps
+    a cProfile file per document.
+    """
+    global _enabled, _profile_dir
+    drain()
+    _enabled = enabled
+    _profile_dir = profile_dir if enabled else None
+    if _profile_dir:
+        os.makedirs(_profile_dir, exist_ok=True)
+
+
+def is_enabled():
+    return _enabled
+
+
+def settings():
+    """Current configure() arguments, e.g. to pass on to a worker process."""
+    return _enabled, _profile_dir
+
+
+class _Stage:
+    __slots__ = ('record', 'name', 'start')
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stages = self.record['stages']
+        stages[self.name] = stages.get(self.name, 0.0) + (time.perf_counter() - self.start)
+        return False
+
+
+def stage(name):
+    """Context manager adding its wall time to `name` in the current document's record."""
+    if not _enabled:
+        return _NULL_STAGE
+    record = getattr(_state, 'record', None)
+    if record is None:
+        return _NULL_STAGE
+    return _Stage(record, name)
+
+
+def count(name, value=1):
+    """Adds `value` to counter `name` in the current document's record."""
+    if not _enabled:
+        return
+    record = getattr(_state, 'record', None)
+    if record is not None:
+        counters = record['counters']
+        counters[name] = counters.get(name, 0) + value
+
+
+def note(name, value):
+    """Records a named value (e.g. an estimate) in the current document's record."""
+    if not _enabled:
+        return
+    record = getattr(_state, 'record', None)
+    if record is not None:
+        record.setdefault('notes', {})[name] = value
+
+
+def _profile_path(doc_id):
+    safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in os.path.basename(str(doc_id)))
+    return os.path.join(_profile_dir, safe + '.prof')
+
+
+@contextmanager
+def document(doc_id):
+    """
+    Collects stage timings and counters for everything run inside the block
+    (on this thread) into one record for `doc_id`, and optionally profiles it.
+    Blocks may nest; only the outermost one is profiled, since a thread can
+    only run one profiler at a time.
+    """
+    if not _enabled:
+        yield None
+        return
+    record = {'document': str(doc_id), 'stages': {}, 'counters': {}}
+    previous = getattr(_state, 'record', None)
+    _state.record = record
+    profiler = cProfile.Profile() if _profile_dir and previous is None else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(_profile_path(doc_id))
+        record['total_seconds'] = time.perf_counter() - start
+        record['stages'] = {k: round(v, 6) for k, v in record['stages'].items()}
+        record['total_seconds'] = round(record['total_seconds'], 6)
+        _state.record = previous
+        with _lock:
+            _records.append(record)
+
+
+def drain():
+    """Returns the collected records and clears them (e.g. to ship them from a worker process)."""
+    with _lock:
+        records = list(_records)
+        _records.clear()
+    return records
+
+
+def extend(records):
+    """Adds records collected elsewhere, such as in a worker process."""
+    with _lock:
+        _records.extend(records)
+
+
+def write_metrics(path):
+    """Writes every collected record to `path` as JSON lines (one document per line), atomically."""
+    with atomic_open(path) as f:
+        for record in drain():
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
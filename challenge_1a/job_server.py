@@ -0,0 +1,156 @@
+
+# job_server.py
+import os
+import sys
+import json
+import signal
+import threading
+import socketserver
+from concurrent.futures import ProcessPoolExecutor
+
+# In-flight requests allowed per worker before readers block (bounds memory)
+PENDING_PER_WORKER = 4
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _run(handler, request):
+    """Runs in a pool worker: one request to one response, errors included."""
+    try:
+        return {"id": request.get("id"), "ok": True, "result": handler(request)}
+    except Exception as e:
+        return {"id": request.get("id"), "ok": False, "error": str(e)}
+
+
+class _ResponseWriter:
+    """Writes responses to one client as they complete and can wait for the outstanding ones."""
+
+    def __init__(self, outfile):
+        self._outfile = outfile
+        self._pending = 0
+        self._condition = threading.Condition()
+
+    def expect(self):
+        with self._condition:
+            self._pending += 1
+
+    def write(self, response, expected=True):
+        line = (json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._condition:
+            try:
+                self._outfile.write(line)
+                self._outfile.flush()
+            except (OSError, ValueError):
+                pass  # The client went away; its remaining responses are dropped
+            if expected:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def drain(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending == 0)
+
+
+class JobServer:
+    """
+    Serves JSON line requests with `handler(request) -> result` on a pool of
+    long-lived worker processes, so the PDF and ranking libraries are imported
+    (and `initializer` has run) once per worker instead of once per request.
+
+    Each request is one JSON object per line and gets one response line,
+    {"id": <request id>, "ok": true, "result": ...} or {"id": ..., "ok": false,
+    "error": "..."}. Requests run concurrently, so responses come back in
+    completion order; match them by id. At most `max_pending` requests are in
+    flight at once; beyond that, reading further requests waits.
+    """
+
+    def __init__(self, handler, workers=1, initializer=None, initargs=(), max_pending=None):
+        self._handler = handler
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs)
+        self._slots = threading.BoundedSemaphore(max_pending or workers * PENDING_PER_WORKER)
+
+    def _start_workers(self):
+        # Workers are forked on first use; do it before any client thread exists
+        self._pool.submit(_warm_up).result()
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _submit(self, line, writer):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            writer.write({"id": None, "ok": False, "error": f"invalid request: {e}"}, expected=False)
+            return
+        self._slots.acquire()
+        writer.expect()
+        future = self._pool.submit(_run, self._handler, request)
+
+        def done(future):
+            self._slots.release()
+            try:
+                response = future.result()
+            except Exception as e:  # e.g. a worker process died
+                response = {"id": request.get("id"), "ok": False, "error": f"worker failed: {e}"}
+            writer.write(response)
+
+        future.add_done_callback(done)
+
+    def serve_stream(self, infile, outfile):
+        """Answers the requests read from binary `infile` on binary `outfile`, until end of input."""
+        writer = _ResponseWriter(outfile)
+        for line in infile:
+            if line.strip():
+                self._submit(line, writer)
+        writer.drain()
+
+    def serve_stdio(self):
+        """
+        Answers requests from stdin on stdout. Everything else written to
+        stdout, such as progress messages (also by the workers), goes to
+        stderr instead, so stdout carries only responses.
+        """
+        sys.stdout.flush()
+        responses = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        self._start_workers()
+        with responses:
+            self.serve_stream(sys.stdin.buffer, responses)
+
+    def serve_unix_socket(self, socket_path):
+        """
+        Listens on a Unix socket; every connection is a request stream as in
+        serve_stream(), all sharing the same worker pool. Runs until interrupted
+        or terminated (SIGINT/SIGTERM), then removes the socket file.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.serve_stream(self.rfile, self.wfile)
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self._start_workers()
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as listener:
+            listener.daemon_threads = True
+            # shutdown() waits for serve_forever() to return, so it must not run on this thread
+            signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=listener.shutdown).start())
+            print(f"Listening on {socket_path}", file=sys.stderr)
+            try:
+                listener.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.remove(socket_path)
@@ -0,0 +1,133 @@
+
+# keyword_matcher.py
+import os
+import re
+import json
+import hashlib
+from functools import lru_cache
+
+# The bundled vocabularies; another file with the same layout can be passed instead
+DEFAULT_KEYWORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keywords.json')
+
+# Flags for a line's leading numbering; vocabularies get the bits above these
+NUMBER_ONLY = 1 << 0    # The whole line is one number: "12"
+LEADING_DIGIT = 1 << 1  # Starts with a digit
+NUMBERED = 1 << 2       # Numbers without a trailing dot, then whitespace: "4 ", "2.1 ", "3.1.1 "
+NUMBERED_DOT = 1 << 3   # One number and a dot, then whitespace: "1. "
+DEPTH_2 = 1 << 4        # NUMBERED with two numbers: "2.1 "
+DEPTH_3 = 1 << 5        # NUMBERED with three numbers: "3.1.1 "
+CAPITALIZED = 1 << 6    # NUMBERED or NUMBERED_DOT, then a capital letter: "2.1 Details"
+TITLED = 1 << 7         # ...and two more word or space characters: "1. Introduction"
+_FIRST_VOCABULARY_BIT = 8
+
+# Numbers, an optional dot, whitespace, and the start of a title; always matches after a digit
+_NUMBERING_RE = re.compile(r"(\d+(?:\.\d+)*)(\.?)(\s*)(?:([A-Z])([\w\s]{2})?)?")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _numbering_flags(match, length):
+    numbers, dot, space, capital, title = match.groups()
+    flags = LEADING_DIGIT
+    depth = numbers.count('.') + 1
+    if depth == 1 and match.end(1) == length:
+        return flags | NUMBER_ONLY
+    if not space:
+        return flags
+    if dot:
+        if depth > 1:  # "2.1. Title" is none of the numbering patterns
+            return flags
+        flags |= NUMBERED_DOT
+    else:
+        flags |= NUMBERED | {2: DEPTH_2, 3: DEPTH_3}.get(depth, 0)
+    if capital:
+        flags |= CAPITALIZED | (TITLED if title else 0)
+    return flags
+
+
+class KeywordMatcher:
+    """
+    Classifies a text line against all keyword vocabularies and the leading
+    numbering patterns at once; classify() returns every flag as one int.
+
+    `keywords` maps a vocabulary name to its words and phrases. They match
+    whole words, case-insensitively, like a \\b(...)\\b regex alternation.
+    `prefixes` maps a vocabulary name to strings the line may start with,
+    also case-insensitively. Each vocabulary gets its own bit (see flag()).
+
+    All keywords are compiled into one table keyed by their first word. A
+    line is split into words once and each word costs one dictionary lookup,
+    so classifying a line takes the same time however many keywords there
+    are. Prefixes are looked up by length, one lookup per distinct length.
+    """
+
+    def __init__(self, keywords=None, prefixes=None):
+        keywords = keywords or {}
+        prefixes = prefixes or {}
+        self._flags = {}
+        # first word -> [flags of the one-word keyword, [(rest of a phrase, its flags)]]
+        self._first_words = {}
+        self._prefixes = {}  # prefix length -> {lowercased prefix: flags}
+        for name, words in keywords.items():
+            flag = self._add_vocabulary(name)
+            for keyword in words:
+                keyword = " ".join(keyword.lower().split())
+                first = _WORD_RE.match(keyword)
+                if not first or not _WORD_RE.match(keyword[-1]):
+                    raise ValueError(f"keyword {keyword!r} in {name!r} must start and end with a word character")
+                entry = self._first_words.setdefault(first.group(), [0, []])
+                rest = keyword[first.end():]
+                if rest:
+                    entry[1].append((rest, flag))
+                else:
+                    entry[0] |= flag
+        for name, starts in prefixes.items():
+            flag = self._add_vocabulary(name)
+            for prefix in starts:
+                prefix = prefix.lower()
+                table = self._prefixes.setdefault(len(prefix), {})
+                table[prefix] = table.get(prefix, 0) | flag
+        self._prefixes = sorted(self._prefixes.items())
+        canonical = json.dumps({"keywords": keywords, "prefixes": prefixes}, sort_keys=True)
+        self.fingerprint = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:12]
+
+    def _add_vocabulary(self, name):
+        if name not in self._flags:
+            self._flags[name] = 1 << (_FIRST_VOCABULARY_BIT + len(self._flags))
+        return self._flags[name]
+
+    def flag(self, name):
+        """The bit of a vocabulary; 0 if it is not configured, so it never matches."""
+        return self._flags.get(name, 0)
+
+    def classify(self, text):
+        """Every numbering and vocabulary flag of `text`, ORed together."""
+        flags = 0
+        match = _NUMBERING_RE.match(text)
+        if match:
+            flags = _numbering_flags(match, len(text))
+        lowered = text.lower()
+        for length, table in self._prefixes:
+            flags |= table.get(lowered[:length], 0)
+        first_words = self._first_words
+        for word in _WORD_RE.finditer(lowered):
+            entry = first_words.get(word.group())
+            if entry is None:
+                continue
+            flags |= entry[0]
+            for rest, flag in entry[1]:
+                end = word.end() + len(rest)
+                if lowered.startswith(rest, word.end()) and not _WORD_RE.match(lowered, end):
+                    flags |= flag
+        return flags
+
+
+@lru_cache(maxsize=None)
+def load_matcher(path=None):
+    """
+    The KeywordMatcher for a vocabulary file (the bundled keywords.json by
+    default), compiled once per process. The file holds
+    {"keywords": {name: [word or phrase, ...]}, "prefixes": {name: [...]}}.
+    """
+    with open(path or DEFAULT_KEYWORDS_FILE, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return KeywordMatcher(config.get("keywords"), config.get("prefixes"))
@@ -1,38 +1,410 @@
+
 # main.py
 import os
-import json
-from heading_extractor import extract_outline
+import time
+import signal
+import argparse
+import multiprocessing
+from contextlib import nullcontext
+from multiprocessing.connection import wait
+import instrumentation
+from heading_extractor import extract_outline, PARSER_VERSION
+from keyword_matcher import load_matcher
+from pdf_backend import BACKENDS, DEFAULT_BACKEND
+from result_cache import ResultCache, DEFAULT_MAX_BYTES
+from job_server import JobServer
+from atomic_output import NDJSONWriter, write_json
+from sync_manifest import MANIFEST_NAME, load_manifest, save_manifest, scan_inputs, diff_manifests, watch_directory
+
+ERROR_OUTLINE = {"title": "Error", "outline": []}
+
+
+def _extract_instrumented(pdf_path, extract_options):
+    with instrumentation.document(os.path.basename(pdf_path)):
+        return extract_outline(pdf_path, **extract_options)
+
+
+def _outline_worker(pdf_path, conn, extract_options, metrics_settings=(False, None)):
+    """Runs in a child process: extracts one outline and sends it back with its metrics."""
+    if hasattr(os, 'setpgrp'):
+        # Own process group, shared with any page-shard pool this worker starts,
+        # so _kill_worker can stop them all together
+        os.setpgrp()
+    instrumentation.configure(*metrics_settings)
+    try:
+        outline_data = _extract_instrumented(pdf_path, extract_options)
+        conn.send(('ok', outline_data, instrumentation.drain()))
+    except Exception as e:
+        conn.send(('error', str(e), instrumentation.drain()))
+    finally:
+        conn.close()
+
+
+def _kill_worker(process):
+    """Stops a file worker together with the page-shard processes it started."""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        process.terminate()
+
+
+def _iter_outlines_sequential(pdf_paths, extract_options):
+    """In-process fallback used when no parallelism or timeout is requested."""
+    for pdf_path in pdf_paths:
+        print(f"Processing: {pdf_path}")
+        try:
+            yield pdf_path, _extract_instrumented(pdf_path, extract_options), None
+        except Exception as e:
+            yield pdf_path, None, e
+
+
+def iter_outlines_parallel(pdf_paths, workers, timeout=None, extract_options=None):
+    """
+    Extracts outlines with up to `workers` child processes, one process per PDF.
+    Yields (pdf_path, outline_data, error) in the same order as `pdf_paths`,
+    whatever order the workers finish in. A PDF that exceeds `timeout` seconds,
+    raises, or crashes its worker yields (pdf_path, None, reason) without
+    affecting the other files. `extract_options` are keyword arguments for
+    extract_outline, e.g. workers=N to additionally split a single long
+    document by page range.
+    """
+    extract_options = extract_options or {}
+    pending = list(enumerate(pdf_paths))
+    pending.reverse()
+    running = {}  # index -> (pdf_path, process, connection, deadline)
+    finished = {}
+    next_index = 0
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index, pdf_path = pending.pop()
+                recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+                # Not a daemon: the worker may start its own pool for page sharding
+                process = multiprocessing.Process(target=_outline_worker,
+                                                  args=(pdf_path, send_conn, extract_options,
+                                                        instrumentation.settings()))
+                process.start()
+                send_conn.close()
+                deadline = time.monotonic() + timeout if timeout else None
+                running[index] = (pdf_path, process, recv_conn, deadline)
+
+            deadlines = [d for _, _, _, d in running.values() if d is not None]
+            wait_timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            wait([conn for _, _, conn, _ in running.values()], timeout=wait_timeout)
+
+            for index, (pdf_path, process, conn, deadline) in list(running.items()):
+                if conn.poll():
+                    try:
+                        status, payload, records = conn.recv()
+                        instrumentation.extend(records)
+                    except EOFError:
+                        process.join()
+                        status, payload = 'error', f"worker exited with code {process.exitcode}"
+                elif deadline is not None and time.monotonic() >= deadline:
+                    _kill_worker(process)
+                    status, payload = 'error', f"timed out after {timeout}s"
+                else:
+                    continue
+                process.join()
+                conn.close()
+                del running[index]
+                if status == 'ok':
+                    finished[index] = (pdf_path, payload, None)
+                else:
+                    finished[index] = (pdf_path, None, payload)
+
+            # Release results strictly in input order
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+    finally:
+        # Also reached when the consumer stops early; never leave workers behind
+        for _, process, conn, _ in running.values():
+            _kill_worker(process)
+            process.join()
+            conn.close()
+
+
+def _iter_with_cache(pdf_paths, cache, extract):
+    """
+    Serves PDFs whose content hash is already cached without opening them, and
+    runs `extract` (an outline iterator factory) only on the misses. Results
+    keep the order of `pdf_paths`; successful new outlines are cached unless
+    they were degraded to meet a time budget.
+    """
+    keys = {pdf_path: cache.key(pdf_path) for pdf_path in pdf_paths}
+    hits = {}
+    for pdf_path in pdf_paths:
+        cached = cache.get(keys[pdf_path])
+        if cached is not None:
+            hits[pdf_path] = cached
+    computed = extract([p for p in pdf_paths if p not in hits])
+    for pdf_path in pdf_paths:
+        if pdf_path in hits:
+            print(f"Cache hit: {pdf_path}")
+            yield pdf_path, hits[pdf_path], None
+            continue
+        pdf_path, outline_data, error = next(computed)
+        if error is None and "degraded" not in outline_data:
+            cache.put(keys[pdf_path], outline_data)
+        yield pdf_path, outline_data, error
+
 
-def process_pdfs(input_dir, output_dir):
+def _open_outline_cache(cache_dir, cache_max_bytes, sample_size, sample_seed, bookmarks=False, keywords=None):
+    """
+    The outline cache for these options; sampled outlines, and those that may
+    come from bookmarks, are kept apart from exact heuristic ones. Outlines
+    are also kept per keyword vocabulary, so editing it invalidates them.
+    """
+    namespace = f"outline-sample{sample_size}-seed{sample_seed}" if sample_size else 'outline'
+    if bookmarks:
+        namespace += '-bookmarks'
+    namespace += f"-kw{load_matcher(keywords).fingerprint}"
+    return ResultCache(cache_dir, namespace, PARSER_VERSION, cache_max_bytes)
+
+
+def _is_pdf(filename):
+    return filename.lower().endswith('.pdf')
+
+
+def _json_path(output_dir, pdf_filename):
+    return os.path.join(output_dir, os.path.splitext(pdf_filename)[0] + '.json')
+
+
+def process_pdfs(input_dir, output_dir, **options):
     """Processes all PDFs in the input directory and saves JSON outlines."""
-    if not os.path.exists(output_dir):
+    filenames = sorted(f for f in os.listdir(input_dir) if _is_pdf(f))
+    process_pdf_paths([os.path.join(input_dir, f) for f in filenames], output_dir, **options)
+
+
+def sync_pdfs(input_dir, output_dir, **options):
+    """
+    Incremental version of process_pdfs. A manifest of size, mtime and content
+    hash per PDF is kept next to the outputs; only new or changed PDFs are
+    processed, and outputs of PDFs removed from the input are deleted. An
+    unchanged PDF whose output is missing is processed again, as is every PDF
+    when the ndjson_file is missing. With an ndjson_file, the records of
+    unchanged PDFs are carried over into it. PDFs that fail or time out get
+    the error outline in place of their previous output and are left out of
+    the manifest, so the next run retries them.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+    current = scan_inputs(input_dir, previous, _is_pdf)
+    changed, removed = diff_manifests(previous, current)
+    ndjson_file = options.get('ndjson_file')
+    if ndjson_file:
+        missing = set() if os.path.exists(ndjson_file) else set(current)
+    else:
+        missing = {name for name in current if not os.path.exists(_json_path(output_dir, name))}
+    changed = sorted(set(changed) | missing)
+
+    for filename in removed:
+        json_path = _json_path(output_dir, filename)
+        if os.path.exists(json_path):
+            os.remove(json_path)
+            print(f"Removed: {json_path}")
+    unchanged = set(current) - set(changed)
+    failed = []
+    if changed or (removed and ndjson_file):
+        failed = process_pdf_paths([os.path.join(input_dir, f) for f in changed], output_dir,
+                                   ndjson_keep=unchanged, **options)
+    print(f"Sync complete: {len(changed)} processed ({len(failed)} failed), {len(removed)} removed, "
+          f"{len(unchanged)} unchanged.")
+    save_manifest(manifest_path, {name: entry for name, entry in current.items() if name not in failed})
+
+
+def process_pdf_paths(pdf_paths, output_dir, workers=1, timeout=None, page_workers=1, cache_dir=None,
+                      cache_max_bytes=DEFAULT_MAX_BYTES, metrics_file=None, profile_dir=None,
+                      backend=DEFAULT_BACKEND, sample_size=None, sample_seed=0, time_budget=None,
+                      ndjson_file=None, ndjson_keep=(), bookmarks=False, keywords=None):
+    """
+    Extracts outlines for the given PDFs and saves them as JSON in output_dir.
+    With workers > 1 (or a per-file timeout) each PDF is parsed in its own
+    child process; outputs are still written in sorted filename order.
+    page_workers > 1 additionally shards long documents by page range.
+    With a cache_dir, PDFs seen before (by content hash) skip parsing entirely.
+    With a metrics_file, per-stage timings and counters of every parsed PDF are
+    written to it as JSON lines; with a profile_dir, each parse is also profiled.
+    `backend` names the PDF backend used for parsing (see pdf_backend.BACKENDS).
+    sample_size and sample_seed turn on sampled font/header statistics in
+    extract_outline; such outlines are cached apart from exact ones.
+    time_budget (seconds per PDF) lets extract_outline degrade rather than
+    run over; it should stay below `timeout`, which kills the worker outright.
+    With bookmarks, PDFs with a usable embedded outline skip the heuristic
+    and layout analysis entirely (see extract_outline). `keywords` is a
+    keyword vocabulary file replacing the bundled keywords.json.
+    With an ndjson_file, outlines are appended to that one file as compact
+    records ({"file": <pdf name>, "title", "outline"}, plus "error" for
+    failures) as they complete, instead of one JSON file each; records of the
+    PDFs named in ndjson_keep are carried over from the previous file. Every
+    output file is replaced atomically, so readers never see a partial one.
+    Returns the filenames of the PDFs that failed or timed out.
+    """
+    if not ndjson_file and not os.path.exists(output_dir):
         os.makedirs(output_dir)
+    instrumentation.configure(bool(metrics_file or profile_dir), profile_dir)
+
+    extract_options = dict(workers=page_workers, backend=backend, sample_size=sample_size, sample_seed=sample_seed,
+                           time_budget=time_budget, bookmarks=bookmarks, keywords=keywords)
+    if workers > 1 or timeout:
+        extract = lambda paths: iter_outlines_parallel(paths, workers, timeout, extract_options)
+    else:
+        extract = lambda paths: _iter_outlines_sequential(paths, extract_options)
+
+    if cache_dir:
+        cache = _open_outline_cache(cache_dir, cache_max_bytes, sample_size, sample_seed, bookmarks, keywords)
+        results = _iter_with_cache(pdf_paths, cache, extract)
+    else:
+        results = extract(pdf_paths)
+
+    failed = []
+    # Only an incremental run keeps records from the previous file; otherwise it is never read
+    carry_over = (lambda record: record.get('file') in ndjson_keep) if ndjson_keep else None
+    ndjson = NDJSONWriter(ndjson_file, carry_over) if ndjson_file else None
+    with ndjson or nullcontext():
+        for pdf_path, outline_data, error in results:
+            filename = os.path.basename(pdf_path)
+            if error is not None:
+                print(f"Error processing {pdf_path}: {error}")
+                failed.append(filename)
+                outline_data = dict(ERROR_OUTLINE, error=str(error)) if ndjson else ERROR_OUTLINE
+            if ndjson:
+                ndjson.write({"file": filename, **outline_data})
+            else:
+                json_path = _json_path(output_dir, filename)
+                write_json(json_path, outline_data)
+                if error is None:
+                    print(f"Saved: {json_path}")
+            if error is None and "degraded" in outline_data:
+                print(f"  Degraded to meet the time budget: {outline_data['degraded']}")
+            if error is None and outline_data.get("source") == "bookmarks":
+                print("  Outline taken from the PDF's bookmarks")
+    if ndjson:
+        print(f"Saved: {ndjson_file} ({ndjson.count} records)")
+
+    if metrics_file:
+        instrumentation.write_metrics(metrics_file)
+        print(f"Metrics: {metrics_file}")
+    return failed
+
+
+# State of a --serve worker process, set up once by _init_serve_worker
+_serve_state = {}
+
+
+def _init_serve_worker(extract_options, cache_dir, cache_max_bytes):
+    _serve_state['extract_options'] = extract_options
+    _serve_state['cache'] = (_open_outline_cache(cache_dir, cache_max_bytes, extract_options['sample_size'],
+                                                 extract_options['sample_seed'], extract_options['bookmarks'],
+                                                 extract_options['keywords'])
+                             if cache_dir else None)
 
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.pdf'):
-            pdf_path = os.path.join(input_dir, filename)
-            print(f"Processing: {pdf_path}")
 
-            try:
-                outline_data = extract_outline(pdf_path)
-                json_filename = os.path.splitext(filename)[0] + '.json'
-                json_path = os.path.join(output_dir, json_filename)
+def serve_outline(request):
+    """
+    One --serve job: {"pdf": <path>} -> the outline in the usual output schema.
+    With "output": <path>, the outline is also written there as JSON.
+    """
+    pdf_path = request['pdf']
+    cache = _serve_state['cache']
+    key = cache.key(pdf_path) if cache else None
+    outline_data = cache.get(key) if cache else None
+    if outline_data is None:
+        outline_data = extract_outline(pdf_path, **_serve_state['extract_options'])
+        if cache and "degraded" not in outline_data:
+            cache.put(key, outline_data)
+    if request.get('output'):
+        write_json(request['output'], outline_data)
+    return outline_data
 
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(outline_data, f, indent=2, ensure_ascii=False)
-                print(f"Saved: {json_path}")
 
-            except Exception as e:
-                print(f"Error processing {pdf_path}: {e}")
-                # Optionally, create an empty JSON or error indicator
-                error_data = {"title": "Error", "outline": []}
-                json_filename = os.path.splitext(filename)[0] + '.json'
-                json_path = os.path.join(output_dir, json_filename)
-                with open(json_path, 'w') as f:
-                    json.dump(error_data, f, indent=2)
+def serve(socket_path=None, workers=1, page_workers=1, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+          backend=DEFAULT_BACKEND, sample_size=None, sample_seed=0, time_budget=None, bookmarks=False,
+          keywords=None):
+    """
+    Runs as a long-lived daemon answering outline jobs (see serve_outline) as
+    JSON lines on stdin/stdout, or on a Unix socket at socket_path. `workers`
+    processes, started once with the libraries imported and the cache open,
+    take the jobs concurrently, so a small PDF costs only its parse time.
+    """
+    extract_options = dict(workers=page_workers, backend=backend, sample_size=sample_size, sample_seed=sample_seed,
+                           time_budget=time_budget, bookmarks=bookmarks, keywords=keywords)
+    with JobServer(serve_outline, workers, _init_serve_worker, (extract_options, cache_dir, cache_max_bytes)) as server:
+        if socket_path:
+            server.serve_unix_socket(socket_path)
+        else:
+            server.serve_stdio()
 
 
 if __name__ == "__main__":
-    INPUT_DIR = "input"
-    OUTPUT_DIR = "output"
-    process_pdfs(INPUT_DIR, OUTPUT_DIR)
+    parser = argparse.ArgumentParser(description="Extract outlines from every PDF in a directory.")
+    parser.add_argument("--input-dir", default="input")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (default: 1, sequential)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Per-file time limit in seconds; slower files get the error outline")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="Processes used to shard a single long PDF by page range (default: 1)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory for the content-addressed outline cache (disabled if unset)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Cache size limit; least recently used entries are evicted beyond it")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process new/changed PDFs and drop outputs of removed ones")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and re-sync whenever the input directory changes (implies --incremental)")
+    parser.add_argument("--watch-interval", type=float, default=2.0,
+                        help="Seconds between input directory polls in --watch mode")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write per-PDF stage timings and counters to this file as JSON lines")
+    parser.add_argument("--profile-dir", default=None,
+                        help="Save a cProfile dump (<pdf name>.prof) per parsed PDF in this directory")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="PDF backend; 'pdfminer' skips pdfplumber's object wrapping (same output, faster)")
+    parser.add_argument("--sample-pages", type=int, default=None,
+                        help="Derive font-size thresholds and header/footer lines from a stratified sample of "
+                             "this many pages per PDF (headings are still scored on every page)")
+    parser.add_argument("--sample-seed", type=int, default=0,
+                        help="Seed for --sample-pages; the same seed always picks the same pages")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Seconds allowed per PDF; beyond it the outline degrades step by step and is "
+                             "returned partial (flagged \"degraded\") instead of late")
+    parser.add_argument("--bookmarks", action="store_true",
+                        help="Use a PDF's embedded outline (bookmarks) when it is usable, skipping layout analysis; "
+                             "such outlines carry \"source\": \"bookmarks\"")
+    parser.add_argument("--keywords", default=None,
+                        help="JSON file of keyword vocabularies for heading detection (see keywords.json, the "
+                             "default); add or change keywords there without touching the code")
+    parser.add_argument("--ndjson-file", default=None,
+                        help="Append every outline to this one file as a compact JSON line ({\"file\", \"title\", "
+                             "\"outline\"}) as it completes, instead of writing one JSON file per PDF")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a daemon: read {\"id\", \"pdf\"} jobs as JSON lines from stdin and answer "
+                             "on stdout, using --workers persistent worker processes")
+    parser.add_argument("--socket", default=None,
+                        help="With --serve, take jobs on this Unix socket instead of stdin/stdout")
+    args = parser.parse_args()
+    # The daemon answers each job on its own; refuse flags it would ignore
+    if args.serve or args.socket:
+        for flag in ('incremental', 'watch', 'ndjson_file'):
+            if getattr(args, flag):
+                parser.error(f"--serve cannot be combined with --{flag.replace('_', '-')}")
+    options = dict(workers=args.workers, timeout=args.timeout, page_workers=args.page_workers,
+                   cache_dir=args.cache_dir, cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+                   metrics_file=args.metrics_file, profile_dir=args.profile_dir, backend=args.backend,
+                   sample_size=args.sample_pages, sample_seed=args.sample_seed, time_budget=args.time_budget,
+                   ndjson_file=args.ndjson_file, bookmarks=args.bookmarks, keywords=args.keywords)
+    if args.serve or args.socket:
+        serve(args.socket, args.workers, args.page_workers, args.cache_dir, options['cache_max_bytes'],
+              args.backend, args.sample_pages, args.sample_seed, args.time_budget, args.bookmarks, args.keywords)
+    elif args.watch:
+        watch_directory(args.input_dir, _is_pdf,
+                        lambda: sync_pdfs(args.input_dir, args.output_dir, **options),
+                        interval=args.watch_interval)
+    elif args.incremental:
+        sync_pdfs(args.input_dir, args.output_dir, **options)
+    else:
+        process_pdfs(args.input_dir, args.output_dir, **options)
@@ -0,0 +1,172 @@
+
+# pdf_backend.py
+import pdfplumber
+from pdfplumber.page import fix_fontname_bytes
+from pdfplumber.utils.text import chars_to_textmap
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LTChar, LTContainer
+from page_layout import analyze_page, release_page, summarize_page
+from instrumentation import stage
+
+DEFAULT_BACKEND = 'pdfplumber'
+
+
+class PdfBackend:
+    """
+    An open PDF that yields one PageLayout per page. Parsers only depend on
+    this interface: `num_pages`, `iter_layouts(start, end)` and close().
+    """
+    name = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        raise NotImplementedError
+
+    @property
+    def num_pages(self):
+        raise NotImplementedError
+
+    def iter_layouts(self, start=0, end=None):
+        raise NotImplementedError
+
+
+class PdfplumberBackend(PdfBackend):
+    """Reference backend: pdfplumber's page and char object model."""
+    name = 'pdfplumber'
+
+    def __init__(self, pdf_path):
+        self._pdf = pdfplumber.open(pdf_path)
+
+    def close(self):
+        self._pdf.close()
+
+    @property
+    def num_pages(self):
+        return len(self._pdf.pages)
+
+    def iter_layouts(self, start=0, end=None):
+        for page_number, page in enumerate(self._pdf.pages[start:end], start=start + 1):
+            layout = analyze_page(page, page_number)
+            release_page(page)
+            yield layout
+
+
+def _page_bbox(page):
+    """Page box as (x0, top, x1, bottom), derived from MediaBox and rotation as pdfplumber does."""
+    x0, x1 = sorted((page.mediabox[0], page.mediabox[2]))
+    y0, y1 = sorted((page.mediabox[1], page.mediabox[3]))
+    if page.rotate in (90, 270):
+        x0, y0, x1, y1 = y0, x0, y1, x1
+    height = y1 - y0
+    return (x0, height - y1, x1, height - y0)
+
+
+def _iter_ltchars(objs):
+    for obj in objs:
+        if isinstance(obj, LTChar):
+            yield obj
+        elif isinstance(obj, LTContainer):
+            # e.g. LTFigure: its chars count as page chars, in place
+            yield from _iter_ltchars(obj._objs)
+
+
+class PdfminerBackend(PdfBackend):
+    """
+    Lean backend on pdfminer.six directly. Pages are interpreted without
+    pdfminer's layout analysis (as pdfplumber does by default), and each glyph
+    becomes a small dict holding only the fields the line builder and the
+    heuristics read, instead of pdfplumber's fully resolved object. Text lines
+    come from the same textmap builder pdfplumber uses, so the resulting
+    PageLayouts match the pdfplumber backend.
+    """
+    name = 'pdfminer'
+
+    def __init__(self, pdf_path):
+        self._file = open(pdf_path, 'rb')
+        try:
+            self._doc = PDFDocument(PDFParser(self._file))
+        except Exception:
+            self._file.close()
+            raise
+        self._rsrcmgr = PDFResourceManager()
+        self._device = PDFPageAggregator(self._rsrcmgr, laparams=None)
+        self._interpreter = PDFPageInterpreter(self._rsrcmgr, self._device)
+        self._num_pages = None
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def num_pages(self):
+        if self._num_pages is None:
+            self._num_pages = sum(1 for _ in PDFPage.create_pages(self._doc))
+        return self._num_pages
+
+    def _page_chars(self, page, bbox, doctop):
+        mb_x0, mb_top = bbox[:2]
+        height = bbox[3] - bbox[1]
+        self._interpreter.process_page(page)
+        chars = []
+        for obj in _iter_ltchars(self._device.get_result()._objs):
+            fontname = obj.fontname
+            if isinstance(fontname, bytes):
+                fontname = fix_fontname_bytes(fontname)
+            top = (height - obj.y1) + mb_top
+            chars.append({
+                'text': obj.get_text(),
+                'fontname': fontname,
+                'size': obj.size,
+                'upright': obj.upright,
+                'x0': obj.x0 + mb_x0,
+                'x1': obj.x1 + mb_x0,
+                'y0': obj.y0,
+                'y1': obj.y1,
+                'top': top,
+                'bottom': (height - obj.y0) + mb_top,
+                'doctop': doctop + top,
+                'width': obj.width,
+                'height': obj.height,
+            })
+        return chars
+
+    def iter_layouts(self, start=0, end=None):
+        doctop = 0
+        for index, page in enumerate(PDFPage.create_pages(self._doc)):
+            if end is not None and index >= end:
+                break
+            bbox = _page_bbox(page)
+            height = bbox[3] - bbox[1]
+            if index >= start:
+                with stage('chars'):
+                    chars = self._page_chars(page, bbox, doctop)
+                with stage('text_lines'):
+                    textmap = chars_to_textmap(chars, layout_bbox=bbox, layout_width=bbox[2] - bbox[0],
+                                               layout_height=height)
+                    text_lines = textmap.extract_text_lines(strip=True, return_chars=True)
+                yield summarize_page(index + 1, height, chars, text_lines)
+            doctop += height
+
+
+BACKENDS = {
+    PdfplumberBackend.name: PdfplumberBackend,
+    PdfminerBackend.name: PdfminerBackend,
+}
+
+
+def open_pdf(pdf_path, backend=DEFAULT_BACKEND):
+    """Opens pdf_path with the named backend (see BACKENDS)."""
+    try:
+        backend_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend {backend!r}; expected one of: {', '.join(BACKENDS)}")
+    return backend_class(pdf_path)
@@ -0,0 +1,199 @@
+
+
+
+# corpus_index_1b.py
+import os
+import json
+import uuid
+from collections import Counter
+import numpy as np
+import scipy.sparse as sp
+from relevance_ranker_1b import preprocess_text
+from tfidf_1b import build_analyzer, l2_normalize
+from section_store_1b import SectionStore
+from instrumentation_1b import count, stage
+from atomic_output_1b import atomic_open
+
+# Bump whenever the on-disk layout or the tokenization changes
+INDEX_VERSION = 3
+
+
+class CorpusIndex:
+    """
+    Persistent TF-IDF index over the sections of a document collection.
+
+    Only raw term counts are stored (one sparse row per section, one column per
+    term some section uses), plus each indexed document's SectionStore and
+    content key. Documents can be added or removed without
+    re-tokenizing the rest of the collection. IDF, the max_features cut and the
+    L2-normalized section matrix are derived from the counts on first use after
+    a change, which is a single pass over the stored nonzeros. Queries only
+    tokenize the query text.
+    """
+
+    def __init__(self, max_features=15000):
+        self.max_features = max_features
+        self.vocabulary = {}  # term -> column in counts
+        self.counts = sp.csr_matrix((0, 0), dtype=np.int64)
+        self.sections = []    # Section view (into stores) per row
+        self.stores = {}      # doc_id -> SectionStore
+        self.documents = {}   # doc_id -> content key (e.g. SHA-256 of the PDF)
+        self._analyzer = build_analyzer()  # Same tokenization as rank_sections
+        self._weights = None  # (section matrix, column -> feature map, idf), rebuilt lazily
+
+    # --- Updating ---
+
+    def has_document(self, doc_id, key):
+        return self.documents.get(doc_id) == key
+
+    def add_document(self, doc_id, parsed_doc, key=None):
+        """Indexes every section with content; replaces an earlier version of doc_id."""
+        self.remove_document(doc_id)
+        store = parsed_doc['sections']
+        store.document = doc_id
+        rows, cols, data = [], [], []
+        # Basic check to avoid ranking empty sections
+        new_sections = store.with_content()
+        with stage('tokenize'):
+            for row, section in enumerate(new_sections):
+                term_counts = Counter(self._analyzer(preprocess_text(section.content)))
+                for term, term_count in term_counts.items():
+                    col = self.vocabulary.setdefault(term, len(self.vocabulary))
+                    rows.append(row)
+                    cols.append(col)
+                    data.append(term_count)
+        count('indexed_sections', len(new_sections))
+
+        width = len(self.vocabulary)
+        block = sp.csr_matrix((data, (rows, cols)), shape=(len(new_sections), width), dtype=np.int64)
+        old = self.counts
+        old = sp.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], width))
+        self.counts = sp.vstack([old, block], format='csr')
+        self.sections.extend(new_sections)
+        self.stores[doc_id] = store
+        self.documents[doc_id] = key
+        self._weights = None
+
+    def remove_document(self, doc_id):
+        if doc_id not in self.documents:
+            return
+        keep = np.array([s.document != doc_id for s in self.sections], dtype=bool)
+        counts = self.counts[keep]
+        # Drop the columns of terms only the removed sections used
+        used = np.flatnonzero(np.bincount(counts.indices, minlength=counts.shape[1]))
+        if len(used) < counts.shape[1]:
+            terms = self._terms()
+            counts = counts[:, used]
+            self.vocabulary = {term: col for col, term in enumerate(terms[used])}
+        self.counts = counts
+        self.sections = [s for s, k in zip(self.sections, keep) if k]
+        del self.stores[doc_id]
+        del self.documents[doc_id]
+        self._weights = None
+
+    def _terms(self):
+        """Array of the terms, indexed by column."""
+        terms = np.empty(len(self.vocabulary), dtype=object)
+        for term, col in self.vocabulary.items():
+            terms[col] = term
+        return terms
+
+    # --- Scoring ---
+
+    def _build_weights(self):
+        with stage('idf'):
+            self._weights = self._compute_weights()
+        count('vocabulary_size', len(self._weights[2]))
+        return self._weights
+
+    def _compute_weights(self):
+        n_sections, width = self.counts.shape
+        term_totals = np.asarray(self.counts.sum(axis=0)).ravel()
+        doc_freq = np.bincount(self.counts.indices, minlength=width)
+        # Keep the max_features most frequent terms across the collection, with
+        # ties at the cut broken as TfidfVectorizer does: same argsort over the
+        # terms in alphabetical order
+        present = np.flatnonzero(doc_freq)
+        if self.max_features is not None and len(present) > self.max_features:
+            present = present[np.argsort(self._terms()[present])]
+            present = present[np.sort((-term_totals[present]).argsort()[:self.max_features])]
+        feature_of = np.full(width, -1, dtype=np.int64)
+        feature_of[present] = np.arange(len(present))
+        # Smoothed IDF, as TfidfVectorizer(smooth_idf=True)
+        idf = np.log((1 + n_sections) / (1 + doc_freq[present])) + 1.0
+
+        matrix = l2_normalize(self.counts[:, present].astype(float).multiply(idf))
+        return matrix, feature_of, idf
+
+    def vectorize(self, texts):
+        """L2-normalized TF-IDF rows (one per text) in the index's feature space."""
+        matrix, feature_of, idf = self._weights or self._build_weights()
+        rows, cols, data = [], [], []
+        for row, text in enumerate(texts):
+            for term, term_count in Counter(self._analyzer(preprocess_text(text))).items():
+                col = self.vocabulary.get(term)
+                feature = feature_of[col] if col is not None else -1
+                if feature >= 0:
+                    rows.append(row)
+                    cols.append(feature)
+                    data.append(term_count * idf[feature])
+        return l2_normalize(sp.csr_matrix((data, (rows, cols)), shape=(len(texts), matrix.shape[1])))
+
+    def score(self, texts):
+        """Cosine similarity of each text against every section: (len(texts), n_sections)."""
+        matrix, _, _ = self._weights or self._build_weights()
+        return (self.vectorize(texts) @ matrix.T).toarray()
+
+    # --- Persistence ---
+
+    def save(self, index_dir):
+        """
+        Writes the index to index_dir. Every save writes its counts to a new
+        file, named in index.json; replacing index.json atomically switches to
+        it, so the counts of one save are never read with the terms of
+        another, even after a crash. Counts files of earlier saves are removed.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        counts_name = f"counts-{uuid.uuid4().hex}.npz"
+        meta = {
+            'version': INDEX_VERSION,
+            'max_features': self.max_features,
+            'counts': counts_name,
+            'terms': self._terms().tolist(),
+            'stores': {doc_id: store.to_json() for doc_id, store in self.stores.items()},
+            'documents': self.documents,
+        }
+        sp.save_npz(os.path.join(index_dir, counts_name), self.counts)
+        with atomic_open(os.path.join(index_dir, 'index.json')) as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+        for name in os.listdir(index_dir):
+            if name.startswith('counts') and name.endswith('.npz') and name != counts_name:
+                try:
+                    os.remove(os.path.join(index_dir, name))
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, index_dir, max_features=15000):
+        """Loads an index from index_dir, or returns an empty one if missing or outdated."""
+        try:
+            with open(os.path.join(index_dir, 'index.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != INDEX_VERSION:
+                return cls(max_features)
+            counts = sp.load_npz(os.path.join(index_dir, meta['counts'])).tocsr()
+        except (OSError, ValueError, KeyError):
+            return cls(max_features)
+        if counts.shape[1] != len(meta['terms']):
+            return cls(max_features)
+        index = cls(meta.get('max_features', max_features))
+        # Rows follow the documents in the order they were added, as in add_document
+        index.stores = {doc_id: SectionStore.from_json(meta['stores'][doc_id], doc_id)
+                        for doc_id in meta['documents']}
+        index.sections = [section for store in index.stores.values() for section in store.with_content()]
+        if counts.shape[0] != len(index.sections):
+            return cls(max_features)
+        index.vocabulary = {term: col for col, term in enumerate(meta['terms'])}
+        index.counts = counts.astype(np.int64)
+        index.documents = meta['documents']
+        return index
@@ -0,0 +1,62 @@
+
+# deadline_1b.py
+import time
+
+# Share of the budget held back for the work that follows page layout
+RESERVE_SHARE = 0.15
+
+
+class Deadline:
+    """
+    Wall-clock budget for one document. Page layout is the whole cost, so the
+    only way to save time is to lay out fewer pages: before each page, the
+    time left is compared against the average time per page so far, and the
+    pages that would no longer finish in time are skipped. Without a budget
+    nothing is ever skipped.
+
+    The start time is taken from time.monotonic(), which is shared by all
+    processes on a machine, so a copy sent to a worker keeps the same deadline.
+    """
+
+    def __init__(self, budget=None):
+        self.start = time.monotonic()
+        self.budget = budget
+        self.reserve = budget * RESERVE_SHARE if budget else 0.0
+        self.pages_skipped = 0
+
+    def remaining(self):
+        if self.budget is None:
+            return float('inf')
+        return self.budget - (time.monotonic() - self.start)
+
+    def merge(self, other):
+        """Folds in the skipped pages of a copy used elsewhere, e.g. for another page range."""
+        self.pages_skipped += other.pages_skipped
+
+    def iter_pages(self, layouts, num_pages):
+        """
+        Passes through `layouts`, a lazy iterator over `num_pages` pages, while
+        the budget allows. Iteration stops before a page that would not finish
+        in time at the average time per page so far, leaving the rest skipped.
+        """
+        if self.budget is None:
+            yield from layouts
+            return
+        layouts = iter(layouts)
+        started = time.monotonic()
+        for done in range(num_pages):
+            if done:
+                per_page = (time.monotonic() - started) / done
+                if per_page > self.remaining() - self.reserve:
+                    self.pages_skipped += num_pages - done
+                    return
+            layout = next(layouts, None)
+            if layout is None:
+                return
+            yield layout
+
+    def report(self):
+        """What was given up to meet the budget, for the output's "degraded" flag; None if nothing was."""
+        if not self.pages_skipped:
+            return None
+        return {"pages_skipped": self.pages_skipped}
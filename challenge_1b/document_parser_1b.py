@@ -2,179 +2,211 @@
 
 
 # document_parser_1b.py
-import pdfplumber
-import re
-from collections import defaultdict
-import statistics
-
-def parse_document(pdf_path):
+import os
+from page_layout_1b import (FontStatistics, HeaderFooterDetector, header_footer_key, iter_page_layouts,
+                            sample_page_indices, bootstrap_stderr)
+from pdf_backend_1b import DEFAULT_BACKEND, open_pdf
+from deadline_1b import Deadline
+from section_store_1b import SectionStore
+from keyword_matcher_1b import (load_matcher, NUMBER_ONLY, LEADING_DIGIT, NUMBERED, NUMBERED_DOT, DEPTH_2,
+                                TITLED)
+import instrumentation_1b
+from instrumentation_1b import count, stage
+
+# Bump whenever a change alters parse_document's output; invalidates cached results
+PARSER_VERSION = 4
+
+# Vocabularies of the keyword file (see keyword_matcher_1b) used here: common
+# section titles, those that suggest an H1 or an H2, travel guide topics, and
+# line starts that rule out a document title
+SECTION_TITLES = 'section_titles'
+H1_TITLES = 'h1_titles'
+H2_TITLES = 'h2_titles'
+TOPICS = 'topics'
+NOT_TITLES = 'not_titles'
+
+def _is_header_footer(line, header_footer_keys):
+    return bool(header_footer_keys) and header_footer_key(line) in header_footer_keys
+
+
+def heading_level(line, header_footer_keys, heading_size_threshold, matcher=None):
+    """
+    Returns "H1"/"H2"/"H3" if the line looks like a heading (simpler heuristic), else None.
+    All text patterns come from one classification of the line by `matcher`
+    (a keyword_matcher_1b.KeywordMatcher; the bundled vocabularies by default).
+    """
+    text = line.text
+    if len(text) < 3: return None
+    if _is_header_footer(line, header_footer_keys) or '......' in text or len(text) > 150:
+        return None
+    matcher = matcher or load_matcher()
+    flags = matcher.classify(text)
+    if flags & NUMBER_ONLY:
+        return None
+
+    score = 0
+    # Scoring for headings - focus on size, boldness, and common patterns
+    if line.size >= heading_size_threshold * 0.8: score += 2 # Relaxed size threshold
+    if line.is_bold: score += 1.5
+    # Patterns for common section titles (more flexible)
+    if flags & matcher.flag(SECTION_TITLES):
+        score += 2.5 # High weight for keywords
+    # Numbered patterns (e.g., 1 Introduction, 1.1 Setup)
+    elif flags & NUMBERED and flags & TITLED:
+        score += 2
+
+    # Threshold to identify headings - lower to catch more
+    if score < 1.5:
+        return None
+    # Determine level primarily by pattern, fallback to size/score
+    level = "H3" # Default
+    if flags & (NUMBERED_DOT | matcher.flag(H1_TITLES)):
+        level = "H1"
+    elif flags & (DEPTH_2 | matcher.flag(H2_TITLES)):
+        level = "H2"
+    # Keywords like "Beaches", "Restaurants" are likely H2 or H3 depending on context
+    elif flags & matcher.flag(TOPICS):
+         # If it's large/bold, maybe H2, otherwise H3. Let's default to H2 for key topics.
+         level = "H2"
+    return level
+
+
+def segment_sections(layouts, header_footer_keys, heading_size_threshold, document=None, matcher=None):
+    """
+    Walks the document's lines once in reading order and cuts a new section at
+    every detected heading line. A section's content is every following line up
+    to the next heading, continuing across page breaks; repeated headers and
+    footers are left out. Text before the first heading belongs to no section.
+    `matcher` classifies the lines (see heading_level).
+    Returns the sections as a SectionStore.
+    """
+    matcher = matcher or load_matcher()
+    sections = SectionStore(document)
+    heading = None  # (level, title, page) of the section being collected
+    content_lines = None
+    for layout in layouts:
+        for line in layout.lines:
+            level = heading_level(line, header_footer_keys, heading_size_threshold, matcher)
+            if level is not None:
+                if heading is not None:
+                    sections.append(*heading, " ".join(content_lines).strip())
+                heading = (level, line.text, layout.page_number)
+                content_lines = []
+            elif content_lines is not None and not _is_header_footer(line, header_footer_keys):
+                content_lines.append(line.text)
+    if heading is not None:
+        sections.append(*heading, " ".join(content_lines).strip())
+    return sections
+
+
+def size_thresholds(stats):
+    """(median text size, heading size threshold) from a document's FontStatistics."""
+    median_text_size = stats.median()
+    # Use 85th percentile for a stricter heading size threshold
+    size_threshold_85 = stats.percentile(0.85)
+    size_threshold_multiplier = median_text_size * 1.3
+    return median_text_size, max(size_threshold_85, size_threshold_multiplier)
+
+
+def parse_document(pdf_path, backend=DEFAULT_BACKEND, sample_size=None, sample_seed=0, time_budget=None,
+                   keywords=None):
     """
     Parses a PDF to extract its title and a hierarchical structure of sections with content.
+    The sections come as a SectionStore named after the PDF's file name.
+    `backend` names the PDF backend (see pdf_backend_1b); all backends give the same result.
+    With sample_size, the size threshold and header/footer lines come from a
+    stratified sample of that many pages (seeded by sample_seed), and their
+    bootstrap standard errors go to the metrics record; sections are still
+    segmented over every page.
+    With a time_budget (seconds), the pages that would no longer be laid out
+    in time are skipped (see deadline_1b.Deadline), and the partial result
+    carries a "degraded" entry with the number of skipped pages.
+    `keywords` is a vocabulary file for the heading keywords (see
+    keyword_matcher_1b.load_matcher); by default the bundled keywords.json.
     """
+    deadline = Deadline(time_budget)
+    parsed_doc = _parse_document(pdf_path, backend, sample_size, sample_seed, deadline, load_matcher(keywords))
+    degraded = deadline.report()
+    if degraded:
+        parsed_doc["degraded"] = degraded
+        instrumentation_1b.note('degraded', degraded)
+    return parsed_doc
+
+
+def _parse_document(pdf_path, backend, sample_size, sample_seed, deadline, matcher):
     doc_title = ""
-    sections = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        # --- PASS 1: Collect Global Font Statistics and Detect Headers/Footers ---
-        all_chars = []
-        page_texts = []
-        for page in pdf.pages:
-            all_chars.extend(page.chars)
-            text = page.extract_text()
-            if text:
-                page_texts.append(text)
-
-        if not all_chars:
-            return {"title": "", "sections": []}
-
-        sizes = [c['size'] for c in all_chars if c['size'] > 0]
-        if not sizes:
-             return {"title": "", "sections": []}
-        median_text_size = statistics.median(sizes)
-        # Use 85th percentile for a stricter heading size threshold
-        size_threshold_85 = sorted(sizes)[int(len(sizes) * 0.85)]
-        size_threshold_multiplier = median_text_size * 1.3
-        heading_size_threshold = max(size_threshold_85, size_threshold_multiplier)
-
-        fonts = [c['fontname'] for c in all_chars]
-        bold_indicators = ['Bold', 'bold', 'Black', 'black', 'Heavy', 'heavy', 'Semibold', 'SemiBold']
-        bold_fonts = {f for f in fonts if any(b in f for b in bold_indicators)}
-
-        line_counter = defaultdict(int)
-        for text_content in page_texts:
-            lines = text_content.split('\n')
-            unique_lines_on_page = set(line.strip() for line in lines if len(line.strip()) > 5 and not re.match(r'^[\d\s\-\.\|]*$', line.strip()))
-            for line in unique_lines_on_page:
-                line_counter[line] += 1
-        num_pages = len(pdf.pages)
-        # Higher threshold for headers/footers to be more specific
-        header_footer_lines = {line for line, count in line_counter.items() if count > max(2, num_pages * 0.5)}
-
-
-        # --- Extract Title (Focus on first page) ---
-        if pdf.pages:
-            first_page = pdf.pages[0]
-            lines = first_page.extract_text_lines()
-            title_candidates = []
-            for line_obj in lines:
-                text = line_obj.get('text', '').strip()
-                if not text or len(text) < 5 or len(text) > 100: continue
-                if text in header_footer_lines or re.match(r'^(page|copyright|version|\d+)', text, re.IGNORECASE) or '......' in text:
-                    continue
-                line_chars = line_obj.get('chars', [])
-                if not line_chars: continue
-                avg_size = sum(c['size'] for c in line_chars) / len(line_chars)
-                is_bold = any(c['fontname'] in bold_fonts for c in line_chars)
-                y_pos_norm = 1.0 - (line_chars[0]['y0'] / first_page.height) if first_page.height > 0 else 0
-                if avg_size >= heading_size_threshold * 0.9 and (is_bold or y_pos_norm < 0.5): # Likely title area
-                     score = avg_size + (5 if is_bold else 0) + (3 if y_pos_norm < 0.4 else 0)
-                     title_candidates.append({'text': text, 'score': score})
-            if title_candidates:
-                title_candidates.sort(key=lambda x: x['score'], reverse=True)
-                doc_title = title_candidates[0]['text']
-
-
-        # --- PASS 2: Extract Potential Headings (Simpler Heuristic) ---
-        all_potential_headings = []
-        for page_num, page in enumerate(pdf.pages, start=1):
-             lines = page.extract_text_lines()
-             for line_obj in lines:
-                text = line_obj.get('text', '').strip()
-                if not text or len(text) < 3: continue
-                if text in header_footer_lines or re.match(r'^\d+$', text) or '......' in text or len(text) > 150:
-                    continue
-                line_chars = line_obj.get('chars', [])
-                if not line_chars: continue
-                avg_size = sum(c['size'] for c in line_chars) / len(line_chars)
-                is_bold = any(c['fontname'] in bold_fonts for c in line_chars)
-                y_pos_norm = 1.0 - (line_chars[0]['y0'] / page.height) if page.height > 0 else 0
-
-                score = 0
-                # Scoring for headings - focus on size, boldness, and common patterns
-                if avg_size >= heading_size_threshold * 0.8: score += 2 # Relaxed size threshold
-                if is_bold: score += 1.5
-                # Patterns for common section titles (more flexible)
-                if re.search(r"\b(Acknowledgements|Table of Contents|Revision History|References|Introduction|Overview|Abstract|Conclusion|Appendix|Bibliography|Index|Glossary|Preface|Chapter|Section|Beaches?|Restaurants?|Nightlife|Cuisine|Cities?|History|Traditions?|Tips|Tricks|Things to Do|Hotels?)\b", text, re.IGNORECASE):
-                    score += 2.5 # High weight for keywords
-                # Numbered patterns (e.g., 1. Introduction, 1.1 Setup)
-                elif re.match(r"^\d+(\.\d+)*\s+[A-Z][\w\s]{2,}", text):
-                    score += 2
-
-                # Threshold to identify headings - lower to catch more
-                if score >= 1.5:
-                    # Determine level primarily by pattern, fallback to size/score
-                    level = "H3" # Default
-                    if re.match(r"^\d+\.\s", text) or re.search(r"\b(Introduction|Overview|References|Acknowledgements|Chapter)\b", text, re.IGNORECASE):
-                        level = "H1"
-                    elif re.match(r"^\d+\.\d+\s", text) or re.search(r"\b(\d+\.\s)?(Preface|Abstract|Conclusion|Appendix|Bibliography|Index|Glossary)\b", text, re.IGNORECASE):
-                        level = "H2"
-                    # Keywords like "Beaches", "Restaurants" are likely H2 or H3 depending on context
-                    elif re.search(r"\b(Beaches?|Restaurants?|Nightlife|Cuisine|Cities?|History|Traditions?|Tips|Tricks|Things to Do|Hotels?)\b", text, re.IGNORECASE):
-                         # If it's large/bold, maybe H2, otherwise H3. Let's default to H2 for key topics.
-                         level = "H2"
-
-                    all_potential_headings.append({
-                        'text': text, 'page': page_num, 'level': level,
-                        'y_pos': y_pos_norm, 'end_y': line_chars[-1]['y0'] if line_chars else 0
-                    })
-
-        # Sort headings by page and position (top to bottom)
-        all_potential_headings.sort(key=lambda x: (x['page'], -x['y_pos']))
-
-        # --- Group into Hierarchy and Extract Content ---
+    document = os.path.basename(pdf_path)
+
+    with stage('open'):
+        doc = open_pdf(pdf_path, backend)
+    with doc:
+        # --- PASS 1: Run Layout Once per Page and Collect Global Statistics ---
+        sample = sample_page_indices(doc.num_pages, sample_size, sample_seed) if sample_size else None
+        pages = iter_page_layouts(doc)
+        if deadline.budget is not None:
+            pages = deadline.iter_pages(pages, doc.num_pages)
+        layouts = list(pages)
+        # Sampled pages past a time-budget cut-off were never laid out
+        stat_layouts = layouts if sample is None else [layouts[i] for i in sample if i < len(layouts)]
+        stats = FontStatistics()
+        for layout in stat_layouts:
+            stats.add_page(layout)
+        # Pages the statistics were gathered from: all of them, or the sample
+        num_pages = len(stat_layouts)
+
+        if not stats.num_chars:
+            return {"title": "", "sections": SectionStore(document)}
+
+        if not stats.num_sizes:
+             return {"title": "", "sections": SectionStore(document)}
+        median_text_size, heading_size_threshold = size_thresholds(stats)
+        if sample is not None and instrumentation_1b.is_enabled():
+            page_size_counts = [layout.size_counts for layout in stat_layouts if layout.size_counts]
+            instrumentation_1b.note('sample_pages', num_pages)
+            instrumentation_1b.note('median_size_stderr',
+                                    bootstrap_stderr(page_size_counts, lambda s: size_thresholds(s)[0]))
+            instrumentation_1b.note('heading_threshold_stderr',
+                                    bootstrap_stderr(page_size_counts, lambda s: size_thresholds(s)[1]))
+
+        with stage('header_footer'):
+            header_footer = HeaderFooterDetector()
+            for layout in stat_layouts:
+                header_footer.add_page(layout)
+            # Higher threshold for headers/footers to be more specific
+            header_footer_keys = header_footer.repeated(num_pages, 0.5)
+
+
+        with stage('title'):
+            # --- Extract Title (Focus on first page) ---
+            if layouts:
+                title_candidates = []
+                for line in layouts[0].lines:
+                    text = line.text
+                    if len(text) < 5 or len(text) > 100: continue
+                    if _is_header_footer(line, header_footer_keys) or \
+                       matcher.classify(text) & (LEADING_DIGIT | matcher.flag(NOT_TITLES)) or '......' in text:
+                        continue
+                    avg_size = line.size
+                    is_bold = line.is_bold
+                    y_pos_norm = line.y_pos
+                    if avg_size >= heading_size_threshold * 0.9 and (is_bold or y_pos_norm < 0.5): # Likely title area
+                         score = avg_size + (5 if is_bold else 0) + (3 if y_pos_norm < 0.4 else 0)
+                         title_candidates.append({'text': text, 'score': score})
+                if title_candidates:
+                    title_candidates.sort(key=lambda x: x['score'], reverse=True)
+                    doc_title = title_candidates[0]['text']
+
+
+        # --- PASS 2: Detect Headings and Segment Content in One Walk ---
         # Simplified: Treat all as potential top-level sections for ranking.
         # The ranking logic will determine importance.
-        for heading in all_potential_headings:
-             # --- Extract Content ---
-            content_text = ""
-            try:
-                page_obj = pdf.pages[heading['page'] - 1] # 0-indexed
-                page_text = page_obj.extract_text()
-                if page_text:
-                    lines_on_page = page_text.split('\n')
-                    start_found = False
-                    content_lines = []
-                    for line in lines_on_page:
-                         line_stripped = line.strip()
-                         if not start_found:
-                            # Match the heading text
-                            if heading['text'] == line_stripped or line_stripped.startswith(heading['text'][:min(20, len(heading['text']))]):
-                                start_found = True
-                                continue # Skip the heading line itself
-                         else:
-                            # Stop when we hit the next potential heading on the same page
-                            is_next_heading = False
-                            # Find the next heading in the sorted list
-                            current_index = all_potential_headings.index(heading)
-                            if current_index + 1 < len(all_potential_headings):
-                                next_h = all_potential_headings[current_index + 1]
-                                if next_h['page'] == heading['page']:
-                                    if next_h['text'] == line_stripped or line_stripped.startswith(next_h['text'][:min(20, len(next_h['text']))]):
-                                        is_next_heading = True
-                            # Also stop if line looks like a new section heading (simplistic check)
-                            elif re.match(r"^(\d+\.)*\d+\.\s+[A-Z]", line_stripped) or \
-                                 re.search(r"\b(Acknowledgements|Table of Contents|Revision History|References|Introduction|Overview|Abstract|Conclusion|Appendix|Bibliography|Index|Glossary)\b", line_stripped, re.IGNORECASE):
-                                 is_next_heading = True
-
-                            if is_next_heading:
-                                break
-                            content_lines.append(line_stripped)
-                    content_text = " ".join(content_lines).strip()
-            except Exception as e:
-                 print(f"Warning: Content extraction issue for '{heading['text']}' in {pdf_path}: {e}")
-                 content_text = "[Content Extraction Error]"
-
-            # Add section to the flat list for ranking
-            sections.append({
-                'level': heading['level'],
-                'title': heading['text'],
-                'page': heading['page'],
-                'content': content_text
-            })
+        with stage('segmentation'):
+            sections = segment_sections(layouts, header_footer_keys, heading_size_threshold, document, matcher)
+        count('sections', len(sections))
 
     return {
         "title": doc_title,
-        "sections": sections # Flat list of sections with content
+        "sections": sections # Flat, column-stored sections sharing one text buffer
     }
 
 
@@ -4,9 +4,31 @@
 # main_1b.py
 import os
 import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from datetime import datetime
-from document_parser_1b import parse_document
-from relevance_ranker_1b import rank_sections
+import instrumentation_1b
+from document_parser_1b import parse_document, PARSER_VERSION
+from keyword_matcher_1b import load_matcher
+from pdf_backend_1b import BACKENDS, DEFAULT_BACKEND
+from relevance_ranker_1b import (rank_sections, rank_indexed_sections, rank_indexed_queries, rank_sections_streaming,
+                                 iter_ranked_records, format_ranked_sections)
+from near_duplicates_1b import NearDuplicateFilter, DEFAULT_THRESHOLD
+from result_cache_1b import ResultCache, DEFAULT_MAX_BYTES, file_digest
+from corpus_index_1b import CorpusIndex
+from section_store_1b import SectionStore
+from job_server_1b import JobServer, PENDING_PER_WORKER
+from atomic_output_1b import NDJSONWriter, write_json
+from sync_manifest_1b import MANIFEST_NAME, load_manifest, save_manifest, scan_inputs, diff_manifests, watch_directory
+
+DEGRADED_KEY_SUFFIX = ":degraded"
+
+def _is_input_file(filename):
+    name = filename.lower()
+    return name.endswith('.pdf') or name in ('persona.txt', 'job.txt')
 
 def load_inputs(input_dir):
     """Loads PDFs, persona, and job from the input directory."""
@@ -27,66 +49,607 @@ def load_inputs(input_dir):
 
     return pdf_paths, persona, job
 
-def main():
-    """Main function to run the Round 1B solution."""
-    INPUT_DIR = "/app/input"
-    OUTPUT_FILE = "/app/output/challenge1b_output.json"
+def _parse_variant(parse_options):
+    """
+    Tag for parse options that change parse_document's output: the keyword
+    vocabulary (by content fingerprint) and sampled statistics.
+    """
+    variant = f"kw{load_matcher(parse_options.get('keywords')).fingerprint}"
+    if parse_options.get('sample_size'):
+        variant += f"-sample{parse_options['sample_size']}-seed{parse_options.get('sample_seed', 0)}"
+    return variant
 
-    print("Loading inputs...")
-    pdf_paths, persona, job = load_inputs(INPUT_DIR)
+def open_parse_cache(cache_dir, cache_max_bytes=DEFAULT_MAX_BYTES, **parse_options):
+    """
+    The parse cache for these parse options; sampled parses are kept apart
+    from exact ones, and parses with one keyword vocabulary from another.
+    """
+    if not cache_dir:
+        return None
+    namespace = f"sections-{_parse_variant(parse_options)}"
+    return ResultCache(cache_dir, namespace, PARSER_VERSION, cache_max_bytes)
 
-    if not pdf_paths:
-        print("No PDF files found in input directory.")
-        return
-    if not persona:
-        print("Warning: persona.txt not found or empty.")
-    if not job:
-        print("Warning: job.txt not found or empty.")
+def _parse_document(pdf_path, **parse_options):
+    parsed_doc = parse_document(pdf_path, **parse_options)
+    if "degraded" in parsed_doc:
+        print(f"    Degraded to meet the time budget: {parsed_doc['degraded']}")
+    return parsed_doc
 
-    print(f"Found {len(pdf_paths)} PDF(s) to process.")
+def parse_with_cache(pdf_path, cache=None, key=None, **parse_options):
+    """
+    parse_document(pdf_path, **parse_options), served from the content-addressed
+    cache when possible. Results degraded to meet a time budget are not cached.
+    """
+    if cache is None:
+        return _parse_document(pdf_path, **parse_options)
+    key = key or cache.key(pdf_path)
+    parsed_doc = cache.get(key)
+    if parsed_doc is not None:
+        # Cached by content, so the entry may come from a copy under another name
+        parsed_doc['sections'] = SectionStore.from_json(parsed_doc['sections'], os.path.basename(pdf_path))
+    else:
+        parsed_doc = _parse_document(pdf_path, **parse_options)
+        if "degraded" not in parsed_doc:
+            cache.put(key, dict(parsed_doc, sections=parsed_doc['sections'].to_json()))
+    return parsed_doc
 
-    # --- Step 1: Parse Documents ---
-    print("Parsing documents...")
-    parsed_documents = []
+def update_index(index_dir, pdf_paths, cache=None, failed_documents=None, **parse_options):
+    """
+    Loads the persistent corpus index from index_dir and brings it in line with
+    pdf_paths: new or changed PDFs (by content hash, parser version and
+    sampling options) are parsed and indexed, PDFs no longer present are
+    dropped, and everything else is reused as-is without parsing or
+    re-tokenizing. With no index_dir, an in-memory index is built and nothing
+    is saved. Names of PDFs that fail to parse are appended to failed_documents.
+    """
+    index = CorpusIndex.load(index_dir) if index_dir else CorpusIndex()
+    doc_ids = set()
+    changed = False
+    for pdf_path in pdf_paths:
+        doc_id = os.path.basename(pdf_path)
+        doc_ids.add(doc_id)
+        digest = file_digest(pdf_path)
+        index_key = ":".join(filter(None, [digest, str(PARSER_VERSION), _parse_variant(parse_options)]))
+        if index.has_document(doc_id, index_key):
+            continue
+        print(f"  Indexing {doc_id}...")
+        with instrumentation_1b.document(doc_id):
+            try:
+                parsed_doc = parse_with_cache(pdf_path, cache, digest, **parse_options)
+            except Exception as e:
+                print(f"    Error parsing {pdf_path}: {e}")
+                if failed_documents is not None:
+                    failed_documents.append(doc_id)
+                if doc_id in index.documents:
+                    # Don't keep ranking the previous version of a changed PDF
+                    index.remove_document(doc_id)
+                    changed = True
+                continue
+            if "degraded" in parsed_doc:
+                # Keyed so that the next update parses the document again
+                index_key += DEGRADED_KEY_SUFFIX
+            index.add_document(doc_id, parsed_doc, index_key)
+        changed = True
+    for doc_id in list(index.documents):
+        if doc_id not in doc_ids:
+            print(f"  Removing {doc_id} from index...")
+            index.remove_document(doc_id)
+            changed = True
+    if changed and index_dir:
+        index.save(index_dir)
+    return index
+
+def indexed_degraded_documents(index):
+    """Documents in the index whose parse was degraded to meet a time budget."""
+    return [doc_id for doc_id, key in index.documents.items() if key and key.endswith(DEGRADED_KEY_SUFFIX)]
+
+def iter_parsed_sections(pdf_paths, cache=None, degraded_documents=None, failed_documents=None, **parse_options):
+    """
+    Parses PDFs one at a time and yields their sections (Section views named
+    after the document), so only one parsed document is held at once. Names of
+    documents degraded to meet a time budget are appended to degraded_documents,
+    those that fail to parse to failed_documents.
+    """
     for pdf_path in pdf_paths:
         doc_id = os.path.basename(pdf_path)
         print(f"  Parsing {doc_id}...")
         try:
-            parsed_doc = parse_document(pdf_path)
-            parsed_doc['doc_id'] = doc_id
-            parsed_documents.append(parsed_doc)
+            with instrumentation_1b.document(doc_id):
+                parsed_doc = parse_with_cache(pdf_path, cache, **parse_options)
         except Exception as e:
             print(f"    Error parsing {pdf_path}: {e}")
+            if failed_documents is not None:
+                failed_documents.append(doc_id)
+            continue
+        if "degraded" in parsed_doc and degraded_documents is not None:
+            degraded_documents.append(doc_id)
+        parsed_doc['sections'].document = doc_id
+        yield from parsed_doc['sections']
 
-    # --- Step 2: Rank Sections ---
-    print("Ranking sections based on relevance...")
-    ranked_output_data = rank_sections(parsed_documents, persona, job)
+# State of a worker process (parsing pipeline or --serve), set up once by _init_worker
+_worker_state = {}
 
-    # --- Step 3: Add Metadata ---
-    print("Adding metadata...")
+def _init_worker(parse_options, cache_dir, cache_max_bytes, metrics_settings=(False, None)):
+    instrumentation_1b.configure(*metrics_settings)
+    _worker_state['parse_options'] = parse_options
+    _worker_state['cache'] = open_parse_cache(cache_dir, cache_max_bytes, **parse_options)
+
+def _parse_job(pdf_path):
+    """Runs in a pipeline worker: parses one PDF -> (parsed_doc, error, metrics records)."""
+    doc_id = os.path.basename(pdf_path)
+    print(f"  Parsing {doc_id}...", flush=True)
+    try:
+        with instrumentation_1b.document(doc_id):
+            parsed_doc = parse_with_cache(pdf_path, _worker_state['cache'], **_worker_state['parse_options'])
+        return parsed_doc, None, instrumentation_1b.drain()
+    except Exception as e:
+        return None, str(e), instrumentation_1b.drain()
+
+def iter_parsed_documents(pdf_paths, workers, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                          degraded_documents=None, max_pending=None, failed_documents=None, **parse_options):
+    """
+    Parses PDFs in a pool of `workers` processes and yields the parsed
+    documents (with their 'doc_id') in input order, each as soon as it and
+    all documents before it are done, while the pool carries on with the next
+    ones. This is the producer side of the parse -> rank pipeline: the
+    consumer (rank_sections) tokenizes a document while later ones are still
+    being parsed. At most max_pending documents (default PENDING_PER_WORKER
+    per worker) are being parsed or waiting to be taken at once, so a slow
+    consumer holds back the pool instead of letting results pile up.
+
+    A document whose parse raises is reported and skipped. If a worker
+    process dies, the documents that were in the pool are parsed again one
+    at a time in a fresh pool, so that only the one that crashes it is lost.
+    Names of documents degraded to meet a time budget are appended to
+    degraded_documents, those lost to an error or a crash to failed_documents;
+    worker metrics are merged into this process's.
+    """
+    max_pending = max(max_pending or workers * PENDING_PER_WORKER, workers)
+    initargs = (parse_options, cache_dir, cache_max_bytes, instrumentation_1b.settings())
+    new_pool = lambda: ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+    pending = deque(enumerate(pdf_paths))  # (index, path) not yet submitted
+    submitted = {}  # index -> future
+    results = {}    # index -> parsed_doc (None if it failed), until its turn comes
+    suspects = set()  # documents in the pool when a worker died
+    next_index = 0
+    pool = new_pool()
+    try:
+        while next_index < len(pdf_paths):
+            in_flight = 1 if suspects else max_pending
+            while pending and len(submitted) < in_flight and len(submitted) + len(results) < max_pending:
+                index, pdf_path = pending.popleft()
+                submitted[index] = pool.submit(_parse_job, pdf_path)
+            if submitted:
+                with instrumentation_1b.stage('parse_wait'):
+                    wait(list(submitted.values()), return_when=FIRST_COMPLETED)
+            crashed = []
+            for index in [i for i, future in submitted.items() if future.done()]:
+                future = submitted.pop(index)
+                if isinstance(future.exception(), BrokenProcessPool):
+                    crashed.append(index)
+                    continue
+                parsed_doc, error, records = future.result()
+                instrumentation_1b.extend(records)
+                if error is not None:
+                    print(f"    Error parsing {pdf_paths[index]}: {error}")
+                results[index] = parsed_doc if error is None else None
+                suspects.discard(index)
+            if crashed:
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool()
+                if suspects:
+                    # Parsed on its own, so this is the document that kills its worker
+                    for index in crashed:
+                        print(f"    Error parsing {pdf_paths[index]}: worker process died")
+                        results[index] = None
+                        suspects.discard(index)
+                else:
+                    suspects = set(crashed) | set(submitted)
+                    pending.extendleft((index, pdf_paths[index]) for index in sorted(suspects, reverse=True))
+                    submitted.clear()
+            while next_index in results:
+                parsed_doc = results.pop(next_index)
+                doc_id = os.path.basename(pdf_paths[next_index])
+                next_index += 1
+                if parsed_doc is None:
+                    if failed_documents is not None:
+                        failed_documents.append(doc_id)
+                    continue
+                parsed_doc['doc_id'] = doc_id
+                if "degraded" in parsed_doc and degraded_documents is not None:
+                    degraded_documents.append(doc_id)
+                yield parsed_doc
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def build_metadata(pdf_paths, persona, job, degraded_documents=None):
+    """
+    The metadata block of the challenge1b_output.json schema. Documents parsed
+    only partially to meet a time budget are listed in it.
+    """
     metadata = {
         "input_documents": [os.path.basename(p) for p in pdf_paths],
         "persona": persona,
         "job_to_be_done": job,
         "processing_timestamp": datetime.utcnow().isoformat() + "Z"
     }
-    ranked_output_data["metadata"] = metadata
+    if degraded_documents:
+        metadata["degraded_documents"] = degraded_documents
+    return metadata
+
+def add_metadata(ranked_output_data, pdf_paths, persona, job, degraded_documents=None):
+    """Adds metadata to a ranking result, in the challenge1b_output.json schema."""
+    print("Adding metadata...")
+    ranked_output_data["metadata"] = build_metadata(pdf_paths, persona, job, degraded_documents)
     # Ensure keys match expected output format exactly
     # The ranker should return the correct keys, but let's make sure
     extracted_sections = ranked_output_data.pop("extracted_sections", [])
     subsection_analysis = ranked_output_data.pop("subsection_analysis", [])
     ranked_output_data["extracted_sections"] = extracted_sections
     ranked_output_data["subsection_analysis"] = subsection_analysis
+    return ranked_output_data
+
+def write_output(output_file, ranked_output_data, pdf_paths, persona, job, degraded_documents=None):
+    """Adds metadata to a ranking result and writes it in the challenge1b_output.json schema."""
+    # --- Add Metadata ---
+    add_metadata(ranked_output_data, pdf_paths, persona, job, degraded_documents)
+
+    # --- Write Output ---
+    print(f"Writing output to {output_file}...")
+    write_json(output_file, ranked_output_data)
+
+def write_output_ndjson(output_file, ranked_records, pdf_paths, persona, job, degraded_documents=None):
+    """
+    Streaming counterpart of write_output for rankings built by
+    iter_ranked_records: a {"metadata": ...} line, then one compact
+    {"extracted_section": ..., "subsection_analysis": ...} line per rank, each
+    written as the ranker yields it. The file appears atomically once complete.
+    """
+    print(f"Writing output to {output_file} as NDJSON...")
+    with NDJSONWriter(output_file) as writer:
+        writer.write({"metadata": build_metadata(pdf_paths, persona, job, degraded_documents)})
+        for extracted_section, subsection_analysis in ranked_records:
+            writer.write({"extracted_section": extracted_section, "subsection_analysis": subsection_analysis})
+
+def _ranking_output(ndjson, near_duplicates=None):
+    """
+    The ranker formatter and output writer for the chosen output format; with
+    near_duplicates, ranked sections also list the duplicates dropped for them.
+    """
+    formatter, write = (iter_ranked_records, write_output_ndjson) if ndjson else (format_ranked_sections, write_output)
+    if near_duplicates is not None:
+        formatter = partial(formatter, duplicates_of=near_duplicates.duplicates_of)
+    return formatter, write
+
+def main(input_dir="/app/input", output_file="/app/output/challenge1b_output.json",
+         cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES, index_dir=None, streaming=False,
+         metrics_file=None, profile_dir=None, backend=DEFAULT_BACKEND, sample_size=None, sample_seed=0,
+         time_budget=None, ndjson=False, dedup_threshold=None, workers=1, keywords=None):
+    """
+    Main function to run the Round 1B solution.
+    With a metrics_file, per-stage timings and counters are written to it as
+    JSON lines (one record per parsed PDF plus one for the ranking); with a
+    profile_dir, each of those steps is also profiled. `backend` names the
+    PDF backend used for parsing (see pdf_backend_1b.BACKENDS); sample_size
+    and sample_seed turn on sampled font/header statistics in parse_document;
+    time_budget (seconds per PDF) lets it return a degraded parse rather than
+    run over; `keywords` is a keyword vocabulary file replacing the bundled
+    keywords.json (see keyword_matcher_1b). With ndjson, output_file is
+    written as NDJSON (see write_output_ndjson) while the ranked sections come
+    out of the ranker, instead of as one JSON document built in memory. With a dedup_threshold,
+    sections nearly repeating an earlier one (estimated Jaccard similarity of
+    their word 3-grams at or above it) are dropped before ranking, and each
+    kept section lists where its dropped copies came from. With workers > 1,
+    PDFs are parsed in that many processes (see iter_parsed_documents) and
+    ranking tokenizes each document as it comes out of the pool, so a run
+    takes about as long as its slowest PDF plus a short ranking tail.
+    Returns the names of the PDFs that could not be parsed.
+    """
+    instrumentation_1b.configure(bool(metrics_file or profile_dir), profile_dir)
+    parse_options = dict(backend=backend, sample_size=sample_size, sample_seed=sample_seed, time_budget=time_budget,
+                         keywords=keywords)
+    near_duplicates = NearDuplicateFilter(dedup_threshold) if dedup_threshold and not index_dir else None
+    if dedup_threshold and index_dir:
+        print("Warning: near-duplicate filtering is not applied to rankings from the corpus index.")
+    formatter, write = _ranking_output(ndjson, near_duplicates)
+    degraded_documents = []
+    failed_documents = []
+    cache = open_parse_cache(cache_dir, cache_max_bytes, **parse_options)
 
-    # --- Step 4: Write Output ---
-    print(f"Writing output to {OUTPUT_FILE}...")
-    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(ranked_output_data, f, indent=2, ensure_ascii=False)
+    print("Loading inputs...")
+    pdf_paths, persona, job = load_inputs(input_dir)
+
+    if not pdf_paths:
+        print("No PDF files found in input directory.")
+        return failed_documents
+    if not persona:
+        print("Warning: persona.txt not found or empty.")
+    if not job:
+        print("Warning: job.txt not found or empty.")
+
+    print(f"Found {len(pdf_paths)} PDF(s) to process.")
+
+    if index_dir:
+        # --- Steps 1-2: Update the Persistent Index and Rank Against It ---
+        print("Updating corpus index...")
+        index = update_index(index_dir, pdf_paths, cache, failed_documents, **parse_options)
+        degraded_documents = indexed_degraded_documents(index)
+        print("Ranking sections based on relevance...")
+        with instrumentation_1b.document('ranking'):
+            ranked_output_data = rank_indexed_sections(index, persona, job, formatter=formatter)
+    elif streaming:
+        # --- Steps 1-2: Parse and Rank as a Stream (bounded memory) ---
+        print("Parsing and ranking documents as a stream...")
+        # Parsing happens inside the ranking loop, so the per-PDF records nest in this one
+        with instrumentation_1b.document('ranking'):
+            if workers > 1:
+                sections = (section for parsed_doc in iter_parsed_documents(
+                                pdf_paths, workers, cache_dir, cache_max_bytes, degraded_documents,
+                                failed_documents=failed_documents, **parse_options)
+                            for section in parsed_doc['sections'])
+            else:
+                sections = iter_parsed_sections(pdf_paths, cache, degraded_documents, failed_documents,
+                                                **parse_options)
+            if near_duplicates is not None:
+                sections = near_duplicates.filter(sections)
+            ranked_output_data = rank_sections_streaming(sections, persona, job, formatter=formatter)
+    elif workers > 1:
+        # --- Steps 1-2: Parse in Worker Processes, Rank as Documents Arrive ---
+        print(f"Parsing documents with {workers} workers and ranking as they arrive...")
+        # Parsing runs while the ranker pulls documents; time spent waiting
+        # for them is the ranking record's parse_wait stage
+        with instrumentation_1b.document('ranking'):
+            parsed_documents = iter_parsed_documents(pdf_paths, workers, cache_dir, cache_max_bytes,
+                                                     degraded_documents, failed_documents=failed_documents,
+                                                     **parse_options)
+            ranked_output_data = rank_sections(parsed_documents, persona, job, formatter, near_duplicates)
+    else:
+        # --- Step 1: Parse Documents ---
+        print("Parsing documents...")
+        parsed_documents = []
+        for pdf_path in pdf_paths:
+            doc_id = os.path.basename(pdf_path)
+            print(f"  Parsing {doc_id}...")
+            try:
+                with instrumentation_1b.document(doc_id):
+                    parsed_doc = parse_with_cache(pdf_path, cache, **parse_options)
+                parsed_doc['doc_id'] = doc_id
+                parsed_documents.append(parsed_doc)
+                if "degraded" in parsed_doc:
+                    degraded_documents.append(doc_id)
+            except Exception as e:
+                print(f"    Error parsing {pdf_path}: {e}")
+                failed_documents.append(doc_id)
+
+        # --- Step 2: Rank Sections ---
+        print("Ranking sections based on relevance...")
+        with instrumentation_1b.document('ranking'):
+            ranked_output_data = rank_sections(parsed_documents, persona, job, formatter, near_duplicates)
+
+    # --- Steps 3-4: Add Metadata and Write Output ---
+    write(output_file, ranked_output_data, pdf_paths, persona, job, degraded_documents)
+    if metrics_file:
+        instrumentation_1b.write_metrics(metrics_file)
+        print(f"Metrics written to {metrics_file}")
 
     print("Round 1B processing complete.")
+    return failed_documents
+
+def load_queries(queries_file):
+    """
+    Reads (query_id, persona, job) triples from a JSONL file with one
+    {"persona": ..., "job": ..., "id": ...} object per line ("id" optional).
+    """
+    queries = []
+    with open(queries_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            query_id = str(record.get('id', f"query_{len(queries) + 1:04d}"))
+            persona = record.get('persona', '').strip()
+            job = record.get('job', record.get('job_to_be_done', '')).strip()
+            queries.append((query_id, persona, job))
+    return queries
+
+def run_batch(queries_file, input_dir="/app/input", output_dir="/app/output",
+              cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES, index_dir=None,
+              metrics_file=None, profile_dir=None, backend=DEFAULT_BACKEND, sample_size=None, sample_seed=0,
+              time_budget=None, ndjson=False, keywords=None):
+    """
+    Answers many persona/job queries against one document collection. The
+    PDFs are parsed and vectorized once; all queries are scored together with
+    a single sparse matrix product, and each result is written to
+    <output_dir>/<query id>.json in the challenge1b_output.json schema
+    (<query id>.ndjson as in main() with ndjson).
+    """
+    instrumentation_1b.configure(bool(metrics_file or profile_dir), profile_dir)
+    parse_options = dict(backend=backend, sample_size=sample_size, sample_seed=sample_seed, time_budget=time_budget,
+                         keywords=keywords)
+    formatter, write = _ranking_output(ndjson)
+    cache = open_parse_cache(cache_dir, cache_max_bytes, **parse_options)
+    pdf_paths, _, _ = load_inputs(input_dir)
+    queries = load_queries(queries_file)
+    if not pdf_paths:
+        print("No PDF files found in input directory.")
+        return
+    print(f"Found {len(pdf_paths)} PDF(s) and {len(queries)} queries.")
+
+    print("Building corpus index...")
+    index = update_index(index_dir, pdf_paths, cache, **parse_options)
+    print(f"Scoring {len(index.sections)} sections against {len(queries)} queries...")
+    with instrumentation_1b.document('ranking'):
+        outputs = rank_indexed_queries(index, [(persona, job) for _, persona, job in queries], formatter=formatter)
+
+    for (query_id, persona, job), ranked_output_data in zip(queries, outputs):
+        output_file = os.path.join(output_dir, os.path.basename(query_id) + ('.ndjson' if ndjson else '.json'))
+        write(output_file, ranked_output_data, pdf_paths, persona, job, indexed_degraded_documents(index))
+    if metrics_file:
+        instrumentation_1b.write_metrics(metrics_file)
+        print(f"Metrics written to {metrics_file}")
+    print("Round 1B batch processing complete.")
+
+def sync(input_dir="/app/input", output_file="/app/output/challenge1b_output.json",
+         cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES, index_dir=None, metrics_file=None, profile_dir=None,
+         backend=DEFAULT_BACKEND, sample_size=None, sample_seed=0, time_budget=None, ndjson=False,
+         dedup_threshold=None, workers=1, keywords=None):
+    """
+    Incremental version of main(). A manifest of size, mtime and content hash
+    of every PDF plus persona.txt/job.txt is kept next to the output. Nothing
+    is rerun when no input changed; otherwise only new or modified PDFs are
+    parsed (unchanged ones come from the parse cache, by default kept next to
+    the output) and removed PDFs simply drop out of the ranking. PDFs that
+    fail to parse are left out of the manifest, so the next run retries them.
+    """
+    output_dir = os.path.dirname(output_file)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+    current = scan_inputs(input_dir, previous, _is_input_file)
+    changed, removed = diff_manifests(previous, current)
+
+    if not changed and not removed and os.path.exists(output_file):
+        print("Inputs unchanged; output is up to date.")
+        return
+    print(f"Inputs changed: {len(changed)} new/modified, {len(removed)} removed.")
+    failed_documents = main(input_dir, output_file, cache_dir=cache_dir or os.path.join(output_dir, '.parse-cache'),
+                            cache_max_bytes=cache_max_bytes, index_dir=index_dir, metrics_file=metrics_file,
+                            profile_dir=profile_dir, backend=backend, sample_size=sample_size,
+                            sample_seed=sample_seed, time_budget=time_budget, ndjson=ndjson,
+                            dedup_threshold=dedup_threshold, workers=workers, keywords=keywords)
+    save_manifest(manifest_path, {name: entry for name, entry in current.items() if name not in failed_documents})
+
+def serve_ranking(request):
+    """
+    One --serve job: {"input_dir": <dir>} (a collection with persona.txt and
+    job.txt) or {"pdfs": [<path>, ...], "persona": ..., "job": ...}, where
+    persona/job also override the files -> the ranking in the
+    challenge1b_output.json schema. With "output": <path>, it is also written there.
+    """
+    if request.get('input_dir'):
+        pdf_paths, persona, job = load_inputs(request['input_dir'])
+    else:
+        pdf_paths, persona, job = list(request.get('pdfs', [])), "", ""
+    persona = request.get('persona', persona)
+    job = request.get('job', job)
+    parsed_documents = []
+    degraded_documents = []
+    for pdf_path in pdf_paths:
+        doc_id = os.path.basename(pdf_path)
+        parsed_doc = parse_with_cache(pdf_path, _worker_state['cache'], **_worker_state['parse_options'])
+        parsed_doc['doc_id'] = doc_id
+        parsed_documents.append(parsed_doc)
+        if "degraded" in parsed_doc:
+            degraded_documents.append(doc_id)
+    ranked_output_data = add_metadata(rank_sections(parsed_documents, persona, job),
+                                      pdf_paths, persona, job, degraded_documents)
+    if request.get('output'):
+        write_json(request['output'], ranked_output_data)
+    return ranked_output_data
+
+def serve(socket_path=None, workers=1, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+          backend=DEFAULT_BACKEND, sample_size=None, sample_seed=0, time_budget=None, keywords=None):
+    """
+    Runs as a long-lived daemon answering ranking jobs (see serve_ranking) as
+    JSON lines on stdin/stdout, or on a Unix socket at socket_path. `workers`
+    processes, started once with the PDF and ranking libraries imported and
+    the parse cache open, take the jobs concurrently.
+    """
+    parse_options = dict(backend=backend, sample_size=sample_size, sample_seed=sample_seed, time_budget=time_budget,
+                         keywords=keywords)
+    with JobServer(serve_ranking, workers, _init_worker, (parse_options, cache_dir, cache_max_bytes)) as server:
+        if socket_path:
+            server.serve_unix_socket(socket_path)
+        else:
+            server.serve_stdio()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Rank PDF sections for a persona and job.")
+    parser.add_argument("--input-dir", default="/app/input")
+    parser.add_argument("--output-file", default="/app/output/challenge1b_output.json")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory for the content-addressed parse cache (disabled if unset)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Cache size limit; least recently used entries are evicted beyond it")
+    parser.add_argument("--index-dir", default=None,
+                        help="Directory of a persistent TF-IDF corpus index; only new/changed PDFs are re-indexed")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Rank with hashed features and a bounded top-k heap; memory independent of collection size")
+    parser.add_argument("--queries", default=None,
+                        help="JSONL file of {\"persona\", \"job\", \"id\"} queries; answers all of them in one batch")
+    parser.add_argument("--output-dir", default="/app/output",
+                        help="Where --queries writes one <id>.json per query")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Write the output (and --queries outputs, as <id>.ndjson) as JSON lines: metadata "
+                             "first, then one line per ranked section, streamed as the ranker produces them")
+    parser.add_argument("--dedup", type=float, nargs='?', const=DEFAULT_THRESHOLD, default=None, metavar="THRESHOLD",
+                        help="Drop sections that nearly repeat an earlier one (MinHash/LSH estimate of word 3-gram "
+                             f"Jaccard similarity >= THRESHOLD, default {DEFAULT_THRESHOLD}) before ranking; not "
+                             "applied with --index-dir or --queries")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip the run when inputs are unchanged and re-parse only new/changed PDFs")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and re-sync whenever the input directory changes (implies --incremental)")
+    parser.add_argument("--watch-interval", type=float, default=2.0,
+                        help="Seconds between input directory polls in --watch mode")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write per-PDF and ranking stage timings and counters to this file as JSON lines")
+    parser.add_argument("--profile-dir", default=None,
+                        help="Save a cProfile dump per parsed PDF and for the ranking in this directory")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="PDF backend; 'pdfminer' skips pdfplumber's object wrapping (same output, faster)")
+    parser.add_argument("--sample-pages", type=int, default=None,
+                        help="Derive font-size thresholds and header/footer lines from a stratified sample of "
+                             "this many pages per PDF (sections still cover every page)")
+    parser.add_argument("--sample-seed", type=int, default=0,
+                        help="Seed for --sample-pages; the same seed always picks the same pages")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Seconds allowed per PDF; beyond it parsing degrades step by step and returns "
+                             "partial sections (listed under metadata.degraded_documents) instead of running late")
+    parser.add_argument("--keywords", default=None,
+                        help="JSON file of keyword vocabularies for heading detection (see keywords.json, the "
+                             "default); add or change keywords there without touching the code")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a daemon: read ranking jobs ({\"id\", \"input_dir\"} or {\"id\", \"pdfs\", "
+                             "\"persona\", \"job\"}) as JSON lines from stdin and answer on stdout")
+    parser.add_argument("--socket", default=None,
+                        help="With --serve, take jobs on this Unix socket instead of stdin/stdout")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes that parse PDFs while ranking consumes them (default and --streaming/"
+                             "--incremental runs), or persistent worker processes for --serve (default: 1)")
+    args = parser.parse_args()
+    # Modes are picked in the order below; refuse flags the chosen mode would ignore
+    if args.serve or args.socket:
+        for flag in ('queries', 'streaming', 'incremental', 'watch', 'index_dir'):
+            if getattr(args, flag):
+                parser.error(f"--serve cannot be combined with --{flag.replace('_', '-')}")
+    if args.queries:
+        for flag in ('streaming', 'incremental', 'watch'):
+            if getattr(args, flag):
+                parser.error(f"--queries cannot be combined with --{flag}")
+    if args.streaming:
+        for flag in ('incremental', 'watch', 'index_dir'):
+            if getattr(args, flag):
+                parser.error(f"--streaming cannot be combined with --{flag.replace('_', '-')}")
+    options = dict(cache_dir=args.cache_dir, cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+                   index_dir=args.index_dir, metrics_file=args.metrics_file, profile_dir=args.profile_dir,
+                   backend=args.backend, sample_size=args.sample_pages, sample_seed=args.sample_seed,
+                   time_budget=args.time_budget, ndjson=args.ndjson, keywords=args.keywords)
+    if args.serve or args.socket:
+        serve(args.socket, args.workers, args.cache_dir, options['cache_max_bytes'], args.backend,
+              args.sample_pages, args.sample_seed, args.time_budget, args.keywords)
+    elif args.queries:
+        run_batch(args.queries, args.input_dir, args.output_dir, **options)
+    elif args.streaming:
+        main(args.input_dir, args.output_file, streaming=True, dedup_threshold=args.dedup, workers=args.workers,
+             **options)
+    elif args.watch:
+        watch_directory(args.input_dir, _is_input_file,
+                        lambda: sync(args.input_dir, args.output_file, dedup_threshold=args.dedup,
+                                     workers=args.workers, **options),
+                        interval=args.watch_interval)
+    elif args.incremental:
+        sync(args.input_dir, args.output_file, dedup_threshold=args.dedup, workers=args.workers, **options)
+    else:
+        main(args.input_dir, args.output_file, dedup_threshold=args.dedup, workers=args.workers, **options)
 
 
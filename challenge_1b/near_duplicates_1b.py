@@ -0,0 +1,143 @@
+
+# near_duplicates_1b.py
+import zlib
+import numpy as np
+from relevance_ranker_1b import preprocess_text
+from instrumentation_1b import count, stage
+
+DEFAULT_THRESHOLD = 0.8
+# 64 MinHash permutations in 16 LSH bands of 4 rows: a pair with Jaccard
+# similarity 0.8 shares a band with probability 1 - (1 - 0.8 ** 4) ** 16 > 0.999,
+# while pairs below ~0.5 rarely become candidates at all
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_WORDS = 3
+# Sections whose signatures are computed together in one NumPy pass
+CHUNK_SIZE = 64
+
+_MAX_HASH = 0xFFFFFFFF
+# Odd multipliers that combine the word hashes of a shingle (wrapping in uint64)
+_MIX = np.array([0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D], dtype=np.uint64)[:SHINGLE_WORDS]
+
+
+def shingle_hashes(text):
+    """
+    Distinct 32-bit hashes of the word 3-grams of a text (a single hash of
+    all its words if it has fewer). Each word is hashed once (CRC32) and the
+    3-gram hashes are mixed from those, without building the 3-gram strings.
+    """
+    words = preprocess_text(text).split()
+    if len(words) < SHINGLE_WORDS:
+        if not words:
+            return np.empty(0, dtype=np.uint64)
+        return np.array([zlib.crc32(" ".join(words).encode('utf-8'))], dtype=np.uint64)
+    word_hashes = np.fromiter(map(zlib.crc32, map(str.encode, words)), dtype=np.uint64, count=len(words))
+    n = len(words) - SHINGLE_WORDS + 1
+    mixed = sum(word_hashes[i:i + n] * _MIX[i] for i in range(SHINGLE_WORDS))
+    return np.unique((mixed >> np.uint64(16)) & np.uint64(_MAX_HASH))
+
+
+class NearDuplicateFilter:
+    """
+    Drops sections whose text nearly repeats an earlier section, e.g. the
+    same boilerplate block in several guides or on several pages.
+
+    Every section gets a MinHash signature over its word 3-grams. Signatures
+    are split into LSH bands, and a section is compared only with the earlier
+    representatives it shares a band with. If their estimated Jaccard
+    similarity reaches `threshold`, it is a duplicate of the most similar
+    representative; otherwise it becomes a representative itself. Each
+    section costs one signature and a few dictionary lookups, so a stream of
+    sections is filtered in linear time and in a single pass. The first
+    occurrence is always the one kept.
+
+    `duplicates` maps a representative's (document, row) to where its dropped
+    copies came from, as {"document", "page", "title"} entries.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, bands=BANDS, seed=1):
+        rng = np.random.default_rng(seed)
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self.bands = bands
+        # Permutation i maps a shingle hash h to the top 32 bits of a[i] * h + b[i]
+        # in wrapping 64-bit arithmetic (multiply-shift hashing, no modulo needed)
+        self._a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+        # Folds the rows of a band into one integer bucket key
+        self._band_mix = rng.integers(1, 1 << 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+        self._buckets = {}      # (band, band key) -> representative indices
+        self._signatures = []   # representative index -> signature
+        self._keys = []         # representative index -> (document, row)
+        self.duplicates = {}
+        self.dropped = 0
+
+    def signatures(self, texts):
+        """
+        MinHash signatures (uint32 rows) of a batch of texts and the LSH bucket
+        keys of each; (None, None) for texts without words.
+        """
+        hashes = [shingle_hashes(text) for text in texts]
+        lengths = np.array([len(h) for h in hashes])
+        result = [(None, None)] * len(texts)
+        filled = np.flatnonzero(lengths)
+        if not len(filled):
+            return result
+        # One (num_perm, all shingles) pass, then the minimum over each text's columns
+        permuted = (np.outer(self._a, np.concatenate(hashes)) + self._b[:, None]) >> np.uint64(32)
+        starts = np.concatenate([[0], np.cumsum(lengths[filled])[:-1]])
+        minima = np.minimum.reduceat(permuted, starts, axis=1).T
+        band_keys = (minima.reshape(len(filled), self.bands, self.rows) * self._band_mix).sum(axis=2)
+        for i, signature, keys in zip(filled, minima.astype(np.uint32), band_keys.tolist()):
+            result[i] = (signature, list(enumerate(keys)))
+        return result
+
+    def _match(self, signature, band_keys):
+        """Index of the most similar representative at or above the threshold, or None."""
+        candidates = set()
+        for band_key in band_keys:
+            candidates.update(self._buckets.get(band_key, ()))
+        best, best_similarity = None, -1.0
+        for candidate in sorted(candidates):  # On equal similarity the earliest wins
+            similarity = np.count_nonzero(self._signatures[candidate] == signature) / len(signature)
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        return best if best_similarity >= self.threshold else None
+
+    def filter(self, sections):
+        """Yields the sections (Section views) that are not near-duplicates of an earlier one."""
+        chunk = []
+        for section in sections:
+            chunk.append(section)
+            if len(chunk) == CHUNK_SIZE:
+                yield from self._filter_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._filter_chunk(chunk)
+        count('duplicate_sections', self.dropped)
+
+    def _filter_chunk(self, sections):
+        with stage('minhash'):
+            signatures = self.signatures([section.content for section in sections])
+        kept = []
+        with stage('lsh'):
+            for section, (signature, band_keys) in zip(sections, signatures):
+                if signature is None:
+                    kept.append(section)
+                    continue
+                match = self._match(signature, band_keys)
+                if match is not None:
+                    self.duplicates.setdefault(self._keys[match], []).append(
+                        {"document": section.document, "page": section.page, "title": section.title})
+                    self.dropped += 1
+                    continue
+                index = len(self._signatures)
+                self._signatures.append(signature)
+                self._keys.append((section.document, section.row))
+                for band_key in band_keys:
+                    self._buckets.setdefault(band_key, []).append(index)
+                kept.append(section)
+        return kept
+
+    def duplicates_of(self, section):
+        return self.duplicates.get((section.document, section.row))
@@ -0,0 +1,229 @@
+
+# page_layout_1b.py
+import re
+import random
+import statistics
+from collections import Counter
+from instrumentation_1b import count, stage
+
+BOLD_INDICATORS = ['Bold', 'bold', 'Black', 'black', 'Heavy', 'heavy', 'Semibold', 'SemiBold']
+
+# Headers/footers are only looked for this close to the top or bottom edge
+# (as a fraction of the page height)
+MARGIN_BAND = 0.1
+_DIGIT_RUN = re.compile(r'\d+')
+_NUMBER_LINE = re.compile(r'^[\d\s\-\.\|]*$')
+
+
+def is_bold_font(fontname):
+    """True if the font name carries one of the usual bold weight markers."""
+    return any(b in fontname for b in BOLD_INDICATORS)
+
+
+class TextLine:
+    """One laid-out text line with the char-level facts the heuristics need."""
+    __slots__ = ('text', 'size', 'is_bold', 'y_pos', 'end_y')
+
+    def __init__(self, text, size, is_bold, y_pos, end_y):
+        self.text = text
+        self.size = size        # Average char size on the line
+        self.is_bold = is_bold  # Any char set in a bold font
+        self.y_pos = y_pos      # Normalized position of the first char: 0=top, 1=bottom
+        self.end_y = end_y      # Raw y0 of the last char
+
+
+class PageLayout:
+    """Result of running layout once on a page; reused by every later pass."""
+    __slots__ = ('page_number', 'height', 'lines', 'size_counts', 'fonts', 'num_chars')
+
+    def __init__(self, page_number, height, lines, size_counts, fonts, num_chars):
+        self.page_number = page_number
+        self.height = height
+        self.lines = lines              # TextLine objects in reading order
+        self.size_counts = size_counts  # Counter of sizes over all chars with size > 0
+        self.fonts = fonts              # Counter of font names over all chars
+        self.num_chars = num_chars
+
+
+class FontStatistics:
+    """
+    Streaming font statistics for a whole document: a histogram of char sizes
+    and a font-name counter, updated one page at a time. Memory depends on the
+    number of distinct sizes/fonts, not on the number of chars.
+    """
+
+    def __init__(self):
+        self.size_counts = Counter()
+        self.font_counts = Counter()
+        self.num_chars = 0
+        self.num_sizes = 0
+
+    def add_page(self, layout):
+        self.size_counts.update(layout.size_counts)
+        self.font_counts.update(layout.fonts)
+        self.num_chars += layout.num_chars
+        self.num_sizes += sum(layout.size_counts.values())
+
+    def merge(self, other):
+        """Folds in statistics collected separately, e.g. for another page range."""
+        self.size_counts.update(other.size_counts)
+        self.font_counts.update(other.font_counts)
+        self.num_chars += other.num_chars
+        self.num_sizes += other.num_sizes
+
+    def _size_at(self, index):
+        """Value at `index` of the sorted size list, without materializing it."""
+        seen = 0
+        for size in sorted(self.size_counts):
+            seen += self.size_counts[size]
+            if index < seen:
+                return size
+        raise IndexError(index)
+
+    def median(self):
+        """Same result as statistics.median() over every char size."""
+        n = self.num_sizes
+        if n % 2 == 1:
+            return self._size_at(n // 2)
+        return (self._size_at(n // 2 - 1) + self._size_at(n // 2)) / 2
+
+    def percentile(self, fraction):
+        """Same result as sorted(sizes)[int(len(sizes) * fraction)]."""
+        return self._size_at(int(self.num_sizes * fraction))
+
+
+def header_footer_key(line, band=MARGIN_BAND):
+    """
+    Identity of a line for header/footer matching: the margin it sits in and
+    its text with digit runs collapsed, so "Page 3 of 40" and "Page 4 of 40"
+    match. Lines outside the top and bottom bands have no key (None).
+    """
+    if line.y_pos < band:
+        edge = 'top'
+    elif line.y_pos > 1.0 - band:
+        edge = 'bottom'
+    else:
+        return None
+    return edge, _DIGIT_RUN.sub('#', line.text)
+
+
+class HeaderFooterDetector:
+    """
+    Counts on how many pages each margin line (see header_footer_key) occurs.
+    Only lines in the top and bottom bands are keyed, so memory follows the
+    number of distinct running headers/footers, not the document's text.
+    """
+
+    def __init__(self):
+        self.page_counts = Counter()
+
+    def add_page(self, layout):
+        # Count each key once per page to avoid skew from repetition within a page
+        keys = set()
+        for line in layout.lines:
+            text = line.text
+            if len(text) > 5 and not _NUMBER_LINE.match(text):
+                key = header_footer_key(line)
+                if key is not None:
+                    keys.add(key)
+        self.page_counts.update(keys)
+
+    def merge(self, other):
+        """Folds in counts collected separately, e.g. for another page range."""
+        self.page_counts.update(other.page_counts)
+
+    def repeated(self, num_pages, min_share):
+        """Keys found on more than `min_share` of `num_pages` pages (and on more than two)."""
+        return {key for key, pages in self.page_counts.items() if pages > max(2, num_pages * min_share)}
+
+
+def sample_page_indices(num_pages, sample_size, seed=0):
+    """
+    Stratified page sample: the document is cut into `sample_size` equal runs
+    of pages and one page is drawn from each, so every part of the document is
+    represented. Deterministic for a given seed. Returns sorted 0-based page
+    indices, or None when the sample would cover the whole document.
+    """
+    if not sample_size or sample_size >= num_pages:
+        return None
+    rng = random.Random(seed)
+    bounds = [num_pages * i // sample_size for i in range(sample_size + 1)]
+    return [rng.randrange(bounds[i], bounds[i + 1]) for i in range(sample_size)]
+
+
+def bootstrap_stderr(page_size_counts, statistic, rounds=100, seed=0):
+    """
+    Standard error of `statistic(FontStatistics)` when computed from a page
+    sample, estimated by resampling the sampled pages' size histograms with
+    replacement. Pages rather than chars are resampled, because chars on one
+    page are strongly correlated.
+    """
+    if len(page_size_counts) < 2:
+        return 0.0
+    rng = random.Random(seed)
+    values = []
+    for _ in range(rounds):
+        stats = FontStatistics()
+        for counts in rng.choices(page_size_counts, k=len(page_size_counts)):
+            stats.size_counts.update(counts)
+            stats.num_sizes += sum(counts.values())
+        if stats.num_sizes:
+            values.append(statistic(stats))
+    return statistics.pstdev(values) if len(values) > 1 else 0.0
+
+
+def release_page(page):
+    """Drops pdfplumber's cached chars and layout objects for a finished page."""
+    close = getattr(page, 'close', None) or page.flush_cache
+    close()
+
+
+def summarize_page(page_number, height, chars, text_lines):
+    """
+    Summarizes one page into a PageLayout. `chars` and `text_lines` are
+    pdfplumber-style dicts (as from page.chars and page.extract_text_lines()),
+    whichever backend produced them.
+    """
+    size_counts = Counter(c['size'] for c in chars if c['size'] > 0)
+    fonts = Counter(c['fontname'] for c in chars)
+
+    lines = []
+    for line_obj in text_lines:
+        text = line_obj.get('text', '').strip()
+        line_chars = line_obj.get('chars', [])
+        if not text or not line_chars:
+            continue
+        avg_size = sum(c['size'] for c in line_chars) / len(line_chars)
+        is_bold = any(is_bold_font(c['fontname']) for c in line_chars)
+        y_pos = 1.0 - (line_chars[0]['y0'] / height) if height > 0 else 0
+        lines.append(TextLine(text, avg_size, is_bold, y_pos, line_chars[-1]['y0']))
+
+    count('pages')
+    count('chars', len(chars))
+    count('lines', len(lines))
+    return PageLayout(page_number, height, lines, size_counts, fonts, len(chars))
+
+
+def analyze_page(page, page_number):
+    """
+    Runs pdfplumber layout analysis on a single page exactly once and
+    summarizes it into a PageLayout.
+    """
+    with stage('chars'):
+        chars = page.chars
+    with stage('text_lines'):
+        text_lines = page.extract_text_lines()
+    return summarize_page(page_number, page.height, chars, text_lines)
+
+
+def iter_page_layouts(doc, stats=None, start=0, end=None):
+    """
+    Yields a PageLayout for every page in [start, end) of a document opened
+    with pdf_backend.open_pdf(), feeding `stats` (a FontStatistics) as it goes.
+    Backends drop each page's parsed objects once summarized, so peak memory
+    follows the largest page rather than the length of the document.
+    """
+    for layout in doc.iter_layouts(start, end):
+        if stats is not None:
+            stats.add_page(layout)
+        yield layout
@@ -2,10 +2,12 @@
 
 
 # relevance_ranker_1b.py
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import heapq
 import re
+from itertools import chain
+from tfidf_1b import TfidfVectorizer, HashingVectorizer, cosine_similarity
+from instrumentation_1b import count, stage
 
 def preprocess_text(text):
     """Basic text preprocessing."""
@@ -17,61 +19,71 @@ def preprocess_text(text):
     text = ' '.join(text.split()) # Normalize whitespace
     return text
 
-def rank_sections(parsed_documents, persona, job):
+def rank_sections(parsed_documents, persona, job, formatter=None, near_duplicates=None):
     """
     Ranks document sections based on their relevance to the job/persona using TF-IDF.
+    The result is built by `formatter` from the sections in rank order
+    (format_ranked_sections by default; iter_ranked_records to stream it).
+    With near_duplicates (a near_duplicates_1b.NearDuplicateFilter), repeated
+    sections are dropped before vectorizing, so only one of each is scored.
+    `parsed_documents` may be any iterable; it is consumed once, in order,
+    and each document is tokenized as soon as it is produced.
     """
+    formatter = formatter or format_ranked_sections
     print("Starting relevance ranking using TF-IDF...")
 
     # --- Prepare Data for TF-IDF ---
-    sections_to_rank = [] # Flat list of all sections
-    all_section_texts = [] # List of texts for TF-IDF
-
-    for doc_data in parsed_documents:
-        doc_id = doc_data.get('doc_id', 'Unknown')
-        # Iterate through the flat list of sections from the parser
-        for section in doc_data.get('sections', []):
-             # Basic check to avoid ranking empty sections
-            if not section.get('content', '').strip():
-                continue
-            sections_to_rank.append({
-                'document': doc_id,
-                'title': section['title'],
-                'page': section['page'],
-                'content': section['content'], # Keep original for Refined Text
-                'level': section.get('level', 'H3') # Default to H3 if missing
-            })
-            # Preprocess content for TF-IDF
-            processed_content = preprocess_text(section['content'])
-            all_section_texts.append(processed_content)
+    sections_to_rank = [] # Flat list of views into each document's SectionStore
 
-    if not sections_to_rank:
-        print("No sections with content found to rank.")
-        return {"extracted_sections": [], "subsection_analysis": []}
+    def iter_sections():
+        for doc_data in parsed_documents:
+            store = doc_data['sections']
+            store.document = doc_data.get('doc_id', store.document or 'Unknown')
+            # Basic check to avoid ranking empty sections
+            yield from store.with_content()
 
-    print(f"Found {len(sections_to_rank)} sections with content to analyze.")
+    sections = iter_sections()
+    if near_duplicates is not None:
+        sections = near_duplicates.filter(sections)
+
+    def iter_section_texts():
+        # Section contents are sliced out and preprocessed one at a time as they are tokenized
+        for section in sections:
+            sections_to_rank.append(section)
+            yield preprocess_text(section.content)
 
     # --- TF-IDF Vectorization ---
     print("Creating TF-IDF vectors...")
-    # Prepare texts for vectorization: [job, persona] + section contents
+    # Prepare texts for vectorization: [job, persona] + section contents.
+    # Documents are only pulled from parsed_documents here, so a lazy source
+    # (e.g. a parsing pipeline) is tokenized while later documents are parsed.
     job_processed = preprocess_text(job)
     persona_processed = preprocess_text(persona)
-    # corpus = [job_processed] + all_section_texts # Just job
-    corpus = [job_processed, persona_processed] + all_section_texts # Job + Persona
+    corpus = chain([job_processed, persona_processed], iter_section_texts()) # Job + Persona
 
-    # Use TF-IDF with reasonable parameters
+    # Use TF-IDF with reasonable parameters: English stop words removed,
+    # unigrams and bigrams, on the already lowercased text
     vectorizer = TfidfVectorizer(
-        stop_words='english',
-        max_features=15000, # Slightly larger vocab
-        ngram_range=(1, 2), # Use unigrams and bigrams
-        lowercase=False # We already lowercased
+        max_features=15000 # Slightly larger vocab
     )
 
+    fit_error = None
     try:
-        tfidf_matrix = vectorizer.fit_transform(corpus)
+        with stage('tfidf_fit'):
+            tfidf_matrix = vectorizer.fit_transform(corpus)
     except ValueError as e:
-        print(f"Error during TF-IDF fitting: {e}")
-        return {"extracted_sections": [], "subsection_analysis": []}
+        fit_error = e
+    if near_duplicates is not None:
+        print(f"Dropped {near_duplicates.dropped} near-duplicate sections.")
+    if not sections_to_rank:
+        print("No sections with content found to rank.")
+        return formatter([])
+    print(f"Found {len(sections_to_rank)} sections with content to analyze.")
+    count('sections', len(sections_to_rank))
+    if fit_error is not None:
+        print(f"Error during TF-IDF fitting: {fit_error}")
+        return formatter([])
+    count('vocabulary_size', len(vectorizer.vocabulary_))
 
     # --- Calculate Similarity ---
     print("Calculating similarities...")
@@ -91,50 +103,173 @@ def rank_sections(parsed_documents, persona, job):
     # --- Simpler: Just use Job for similarity ---
     job_vector = tfidf_matrix[0] # Shape: (1, num_features)
     section_vectors = tfidf_matrix[2:] # Shape: (num_sections, num_features)
-    final_scores = cosine_similarity(job_vector, section_vectors).flatten() # Shape: (num_sections,)
+    with stage('similarity'):
+        final_scores = cosine_similarity(job_vector, section_vectors).flatten() # Shape: (num_sections,)
 
 
-    # --- Assign Scores and Rank ---
+    # --- Rank ---
     print("Assigning scores and ranking...")
-    for i, section in enumerate(sections_to_rank):
-        if i < len(final_scores):
-            section['relevance_score'] = float(final_scores[i])
-        else:
-            section['relevance_score'] = 0.0
-
-    # Sort sections by relevance score descending
-    sections_to_rank.sort(key=lambda x: x['relevance_score'], reverse=True)
-
-    # Assign importance_rank
-    for i, section in enumerate(sections_to_rank):
-        section['importance_rank'] = i + 1
+    # Sort sections by relevance score descending; equal scores keep document order
+    with stage('sort'):
+        order = np.argsort(-final_scores, kind='stable')
+        sections_to_rank = [sections_to_rank[i] for i in order]
 
     # --- Prepare Output JSON ---
     print("Preparing output JSON...")
-    extracted_sections = []
-    subsection_analyses = []
+    output = formatter(sections_to_rank)
+    print("Ranking complete.")
+    return output
 
+def iter_ranked_records(ranked_sections, top_k=50, duplicates_of=None):
+    """
+    Lazily yields one (extracted_section, subsection_analysis) pair per rank
+    for sections in rank order, so the output can be written as it is built.
+    This is where section text is materialised from its SectionStore.
+    `duplicates_of(section)`, if given, returns where the near-duplicates
+    dropped in favour of a section came from; they are listed under the
+    extracted section's "duplicates".
+    """
     # Take top sections (e.g., top 20-50 or all above a threshold like 0.01)
     # top_sections = [s for s in sections_to_rank if s['relevance_score'] > 0.01] # Threshold example
-    top_sections = sections_to_rank[:50] # Take top 50
-
-    for section in top_sections:
-        extracted_sections.append({
-            "document": section['document'],
-            "page": section['page'],
-            "title": section['title'], # Use 'title' as per expected output
-            "importance_rank": section['importance_rank']
-        })
-        subsection_analyses.append({
-            "document": section['document'],
-            "title": section['title'], # Parent section title
-            "Refined Text": section['content'], # The actual relevant content
-            "page": section['page']
+    top_sections = ranked_sections[:top_k] # Take top 50
+
+    for i, section in enumerate(top_sections):
+        title = section.title
+        extracted_section = {
+            "document": section.document,
+            "page": section.page,
+            "title": title, # Use 'title' as per expected output
+            "importance_rank": i + 1
+        }
+        duplicates = duplicates_of(section) if duplicates_of else None
+        if duplicates:
+            extracted_section["duplicates"] = duplicates
+        yield (extracted_section, {
+            "document": section.document,
+            "title": title, # Parent section title
+            "Refined Text": section.content, # The actual relevant content
+            "page": section.page
         })
 
-    print("Ranking complete.")
+def format_ranked_sections(ranked_sections, top_k=50, duplicates_of=None):
+    """Builds the extracted_sections/subsection_analysis output from sections in rank order."""
+    extracted_sections = []
+    subsection_analyses = []
+    for extracted_section, subsection_analysis in iter_ranked_records(ranked_sections, top_k, duplicates_of):
+        extracted_sections.append(extracted_section)
+        subsection_analyses.append(subsection_analysis)
+
     return {
         "extracted_sections": extracted_sections,
         "subsection_analysis": subsection_analyses
     }
 
+def rank_indexed_queries(index, queries, top_k=50, formatter=None):
+    """
+    Ranks the sections of a CorpusIndex for many (persona, job) pairs at once.
+    All job texts are vectorized together and scored with one sparse
+    matrix-matrix product; returns one output dict (or whatever `formatter`
+    builds, as in rank_sections) per query, in order.
+    """
+    formatter = formatter or format_ranked_sections
+    if not index.sections:
+        return [formatter([]) for _ in queries]
+
+    # --- Simpler: Just use Job for similarity ---
+    with stage('similarity'):
+        score_matrix = index.score([job for _, job in queries]) # Shape: (num_queries, num_sections)
+    outputs = []
+    with stage('sort'):
+        for final_scores in score_matrix:
+            order = np.argsort(-final_scores, kind='stable')
+            outputs.append(formatter([index.sections[i] for i in order[:top_k]], top_k))
+    count('queries', len(queries))
+    return outputs
+
+def rank_indexed_sections(index, persona, job, top_k=50, formatter=None):
+    """
+    Ranks the sections of a prebuilt CorpusIndex like rank_sections: only the
+    job text is vectorized; IDF and section vectors come from the index.
+    Unlike rank_sections, the IDF and the max_features cut are taken over the
+    indexed sections alone, without the job and persona texts, so that the
+    index serves every query as is. IDF values therefore differ slightly, and
+    sections with close scores can come out in a different order.
+    """
+    print("Starting relevance ranking using the corpus index...")
+    if not index.sections:
+        print("No sections with content found to rank.")
+    else:
+        print(f"Found {len(index.sections)} sections with content to analyze.")
+    output = rank_indexed_queries(index, [(persona, job)], top_k, formatter)[0]
+    print("Ranking complete.")
+    return output
+
+def _score_chunk(hasher, job_vector, chunk, heap, top_k, first_seq):
+    """Scores one chunk of sections and keeps only the running top_k in `heap`."""
+    with stage('hashing'):
+        section_vectors = hasher.transform([preprocess_text(section.content) for section in chunk])
+    with stage('similarity'):
+        scores = (section_vectors @ job_vector.T).toarray().ravel()
+    # Only the chunk's own top_k can possibly enter the overall top_k; among
+    # sections tied with the k-th score, the earliest ones win
+    if len(scores) > top_k:
+        kth_score = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+        above = np.flatnonzero(scores > kth_score)
+        ties = np.flatnonzero(scores == kth_score)[:top_k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = range(len(scores))
+    for i in candidates:
+        # Min-heap on (score, -seq): the root is the weakest entry, and on equal
+        # scores the later section loses, matching a stable descending sort.
+        entry = (float(scores[i]), -(first_seq + int(i)), chunk[i])
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+def rank_sections_streaming(section_stream, persona, job, top_k=50, chunk_size=1000, n_features=2 ** 20,
+                            formatter=None):
+    """
+    Out-of-core variant of rank_sections for very large collections.
+
+    `section_stream` yields Sections (views into the documents'
+    SectionStores) as the parser produces them. Sections are
+    vectorized in chunks with fixed-size hashed unigram+bigram features, so no
+    global vocabulary or corpus matrix is ever built, and only a bounded top_k
+    heap survives between chunks. Peak memory depends on chunk_size and top_k,
+    not on the collection size.
+
+    IDF needs a full pass over the corpus, so this mode scores by cosine
+    similarity of L2-normalized term frequencies (English stop words removed);
+    rankings are close to, but not identical with, rank_sections. `formatter`
+    builds the result as in rank_sections.
+    """
+    formatter = formatter or format_ranked_sections
+    print("Starting streaming relevance ranking with hashed features...")
+    # Unigrams and bigrams without English stop words, as in rank_sections
+    hasher = HashingVectorizer(n_features=n_features)
+    job_vector = hasher.transform([preprocess_text(job)])
+
+    heap = []
+    chunk = []
+    seen = 0
+    for section in section_stream:
+        # Basic check to avoid ranking empty sections
+        if not section.has_content:
+            continue
+        chunk.append(section)
+        if len(chunk) >= chunk_size:
+            _score_chunk(hasher, job_vector, chunk, heap, top_k, seen)
+            seen += len(chunk)
+            chunk = []
+    if chunk:
+        _score_chunk(hasher, job_vector, chunk, heap, top_k, seen)
+        seen += len(chunk)
+
+    print(f"Scored {seen} sections with content.")
+    count('sections', seen)
+    ranked = [section for _, _, section in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+    output = formatter(ranked, top_k)
+    print("Ranking complete.")
+    return output
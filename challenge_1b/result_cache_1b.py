@@ -0,0 +1,117 @@
+
+# result_cache_1b.py
+import os
+import gzip
+import json
+import hashlib
+import tempfile
+from atomic_output_1b import set_file_mode
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of parse results.
+
+    Entries are keyed by the SHA-256 of the PDF bytes plus a parser version,
+    so renamed or copied files still hit and a parser change invalidates
+    everything. Each entry is gzipped compact JSON. When the cache grows past
+    `max_bytes`, least recently used entries (by mtime, refreshed on every
+    hit) are evicted.
+
+    The cache's size is counted by walking it once, on the first put, and
+    then kept as a running total, so a put only walks the cache again when
+    it goes over the limit. Entries written by other processes sharing the
+    directory are only counted at that walk, so they can delay eviction.
+    """
+
+    def __init__(self, cache_dir, namespace, version, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = os.path.join(cache_dir, f"{namespace}-v{version}")
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # Size of all entries; counted by the first put
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, pdf_path):
+        return file_digest(pdf_path)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.json.gz')
+
+    def get(self, key):
+        """Returns the cached result for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path) # Mark as recently used
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """Stores `result` atomically, then trims the cache if it is over its size limit."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            set_file_mode(fd, path)
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, separators=(',', ':'))
+            size = os.path.getsize(tmp_path)
+            try:
+                size -= os.path.getsize(path)  # Replacing an existing entry
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self._total_bytes is None:
+            self.evict()
+        else:
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """
+        Deletes least recently used entries until the cache fits in max_bytes,
+        and resets the running total to what is left.
+        """
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.endswith('.json.gz'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._total_bytes = total
@@ -0,0 +1,118 @@
+
+# section_store_1b.py
+from array import array
+
+# Heading levels, stored as their position in this tuple
+LEVELS = ("H1", "H2", "H3")
+
+
+class SectionStore:
+    """
+    The sections of one document in column form. Every title and content is
+    kept in a single text buffer, laid out as title, content, title, content,
+    and so on. A section is one row of fixed-width columns: its page, its
+    level, and the boundaries of its title and content in the buffer. That is
+    21 bytes per section plus the text itself. Titles and contents are sliced
+    out of the buffer only when they are asked for, i.e. when a section is
+    vectorized or written to the output.
+
+    Rows are handed out as Section views, which hold only the store and the
+    row number. `document` is the name rankers and outputs use for the document.
+    """
+
+    def __init__(self, document=None):
+        self.document = document
+        self.pages = array('i')
+        self.levels = array('b')
+        self.bounds = array('q', [0])  # row i: title [2i, 2i+1), content [2i+1, 2i+2)
+        self._text = ""
+        self._parts = []  # appended text not yet joined into the buffer
+
+    @property
+    def text(self):
+        if self._parts:
+            self._text += "".join(self._parts)
+            self._parts = []
+        return self._text
+
+    def append(self, level, title, page, content):
+        self.pages.append(page)
+        self.levels.append(LEVELS.index(level))
+        self._parts += (title, content)
+        self.bounds.append(self.bounds[-1] + len(title))
+        self.bounds.append(self.bounds[-1] + len(content))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __iter__(self):
+        return (Section(self, row) for row in range(len(self)))
+
+    def __eq__(self, other):
+        if not isinstance(other, SectionStore):
+            return NotImplemented
+        return (self.text == other.text and self.pages == other.pages and self.levels == other.levels
+                and self.bounds == other.bounds)
+
+    def title(self, row):
+        return self.text[self.bounds[2 * row]:self.bounds[2 * row + 1]]
+
+    def content(self, row):
+        return self.text[self.bounds[2 * row + 1]:self.bounds[2 * row + 2]]
+
+    def has_content(self, row):
+        # Contents are stored stripped, so any character is a non-blank one
+        return self.bounds[2 * row + 2] > self.bounds[2 * row + 1]
+
+    def with_content(self):
+        """Views of the rows that have content, in order; the only ones worth ranking."""
+        return [Section(self, row) for row in range(len(self)) if self.has_content(row)]
+
+    # --- Persistence ---
+
+    def to_json(self):
+        return {"text": self.text, "pages": self.pages.tolist(), "levels": self.levels.tolist(),
+                "bounds": self.bounds.tolist()}
+
+    @classmethod
+    def from_json(cls, data, document=None):
+        store = cls(document)
+        store._text = data["text"]
+        store.pages = array('i', data["pages"])
+        store.levels = array('b', data["levels"])
+        store.bounds = array('q', data["bounds"])
+        return store
+
+
+class Section:
+    """One row of a SectionStore; every field is read from the store on access."""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def document(self):
+        return self.store.document
+
+    @property
+    def page(self):
+        return self.store.pages[self.row]
+
+    @property
+    def level(self):
+        return LEVELS[self.store.levels[self.row]]
+
+    @property
+    def title(self):
+        return self.store.title(self.row)
+
+    @property
+    def content(self):
+        return self.store.content(self.row)
+
+    @property
+    def has_content(self):
+        return self.store.has_content(self.row)
@@ -0,0 +1,80 @@
+
+# sync_manifest_1b.py
+import os
+import json
+import time
+from result_cache_1b import file_digest
+from atomic_output_1b import atomic_open
+
+MANIFEST_NAME = '.sync-manifest.json'
+
+
+def load_manifest(path):
+    """Loads {filename: {"size", "mtime_ns", "sha256"}}; empty if missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, entries):
+    """Writes the manifest atomically so an interrupted run never leaves it half-written."""
+    with atomic_open(path) as f:
+        json.dump({'files': entries}, f, indent=2, sort_keys=True)
+
+
+def _stat_inputs(input_dir, match):
+    stats = {}
+    for entry in os.scandir(input_dir):
+        if entry.is_file() and match(entry.name):
+            st = entry.stat()
+            stats[entry.name] = (st.st_size, st.st_mtime_ns)
+    return stats
+
+
+def scan_inputs(input_dir, previous, match):
+    """
+    Builds manifest entries for the files in `input_dir` accepted by `match`.
+    A file whose size and mtime are unchanged keeps its recorded hash; only
+    touched files are re-hashed.
+    """
+    current = {}
+    for name, (size, mtime_ns) in _stat_inputs(input_dir, match).items():
+        old = previous.get(name)
+        if old and old['size'] == size and old['mtime_ns'] == mtime_ns:
+            current[name] = old
+        else:
+            current[name] = {
+                'size': size,
+                'mtime_ns': mtime_ns,
+                'sha256': file_digest(os.path.join(input_dir, name)),
+            }
+    return current
+
+
+def diff_manifests(previous, current):
+    """Returns (changed, removed): new or content-changed names, and names that disappeared."""
+    changed = sorted(name for name, entry in current.items()
+                     if name not in previous or previous[name]['sha256'] != entry['sha256'])
+    removed = sorted(name for name in previous if name not in current)
+    return changed, removed
+
+
+def watch_directory(input_dir, match, on_change, interval=2.0):
+    """
+    Calls `on_change()` once, then again whenever the set of matching files in
+    `input_dir` (names, sizes, mtimes) changes. Polls every `interval` seconds
+    until interrupted.
+    """
+    snapshot = _stat_inputs(input_dir, match)
+    on_change()
+    try:
+        while True:
+            time.sleep(interval)
+            latest = _stat_inputs(input_dir, match)
+            if latest != snapshot:
+                snapshot = latest
+                on_change()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,168 @@
+
+# tfidf_1b.py
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+import scipy.sparse as sp
+
+# scikit-learn's English stop word list (from the Glasgow Information Retrieval Group)
+ENGLISH_STOP_WORDS = frozenset([
+    'a', 'about', 'above', 'across', 'after', 'afterwards', 'again', 'against', 'all', 'almost',
+    'alone', 'along', 'already', 'also', 'although', 'always', 'am', 'among', 'amongst',
+    'amoungst', 'amount', 'an', 'and', 'another', 'any', 'anyhow', 'anyone', 'anything',
+    'anyway', 'anywhere', 'are', 'around', 'as', 'at', 'back', 'be', 'became', 'because',
+    'become', 'becomes', 'becoming', 'been', 'before', 'beforehand', 'behind', 'being', 'below',
+    'beside', 'besides', 'between', 'beyond', 'bill', 'both', 'bottom', 'but', 'by', 'call',
+    'can', 'cannot', 'cant', 'co', 'con', 'could', 'couldnt', 'cry', 'de', 'describe', 'detail',
+    'do', 'done', 'down', 'due', 'during', 'each', 'eg', 'eight', 'either', 'eleven', 'else',
+    'elsewhere', 'empty', 'enough', 'etc', 'even', 'ever', 'every', 'everyone', 'everything',
+    'everywhere', 'except', 'few', 'fifteen', 'fifty', 'fill', 'find', 'fire', 'first', 'five',
+    'for', 'former', 'formerly', 'forty', 'found', 'four', 'from', 'front', 'full', 'further',
+    'get', 'give', 'go', 'had', 'has', 'hasnt', 'have', 'he', 'hence', 'her', 'here',
+    'hereafter', 'hereby', 'herein', 'hereupon', 'hers', 'herself', 'him', 'himself', 'his',
+    'how', 'however', 'hundred', 'i', 'ie', 'if', 'in', 'inc', 'indeed', 'interest', 'into',
+    'is', 'it', 'its', 'itself', 'keep', 'last', 'latter', 'latterly', 'least', 'less', 'ltd',
+    'made', 'many', 'may', 'me', 'meanwhile', 'might', 'mill', 'mine', 'more', 'moreover',
+    'most', 'mostly', 'move', 'much', 'must', 'my', 'myself', 'name', 'namely', 'neither',
+    'never', 'nevertheless', 'next', 'nine', 'no', 'nobody', 'none', 'noone', 'nor', 'not',
+    'nothing', 'now', 'nowhere', 'of', 'off', 'often', 'on', 'once', 'one', 'only', 'onto',
+    'or', 'other', 'others', 'otherwise', 'our', 'ours', 'ourselves', 'out', 'over', 'own',
+    'part', 'per', 'perhaps', 'please', 'put', 'rather', 're', 'same', 'see', 'seem', 'seemed',
+    'seeming', 'seems', 'serious', 'several', 'she', 'should', 'show', 'side', 'since',
+    'sincere', 'six', 'sixty', 'so', 'some', 'somehow', 'someone', 'something', 'sometime',
+    'sometimes', 'somewhere', 'still', 'such', 'system', 'take', 'ten', 'than', 'that', 'the',
+    'their', 'them', 'themselves', 'then', 'thence', 'there', 'thereafter', 'thereby',
+    'therefore', 'therein', 'thereupon', 'these', 'they', 'thick', 'thin', 'third', 'this',
+    'those', 'though', 'three', 'through', 'throughout', 'thru', 'thus', 'to', 'together',
+    'too', 'top', 'toward', 'towards', 'twelve', 'twenty', 'two', 'un', 'under', 'until', 'up',
+    'upon', 'us', 'very', 'via', 'was', 'we', 'well', 'were', 'what', 'whatever', 'when',
+    'whence', 'whenever', 'where', 'whereafter', 'whereas', 'whereby', 'wherein', 'whereupon',
+    'wherever', 'whether', 'which', 'while', 'whither', 'who', 'whoever', 'whole', 'whom',
+    'whose', 'why', 'will', 'with', 'within', 'without', 'would', 'yet', 'you', 'your', 'yours',
+    'yourself', 'yourselves'
+])
+
+# Words of two or more alphanumeric characters, as scikit-learn's default token_pattern
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def build_analyzer(stop_words=ENGLISH_STOP_WORDS):
+    """
+    Text -> list of features: word unigrams followed by the bigrams of
+    adjacent words, after stop word removal. Text is taken as is (callers
+    lowercase it with preprocess_text). Same features, in the same order,
+    as scikit-learn's analyzer for stop_words='english', ngram_range=(1, 2).
+    """
+    findall = TOKEN_PATTERN.findall
+
+    def analyze(text):
+        tokens = [token for token in findall(text) if token not in stop_words]
+        return tokens + [first + ' ' + second for first, second in zip(tokens, tokens[1:])]
+
+    return analyze
+
+
+def l2_normalize(matrix):
+    """Scales every row of a sparse matrix to unit length (all-zero rows stay zero)."""
+    matrix = sp.csr_matrix(matrix, dtype=float)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sp.diags(1.0 / norms) @ matrix).tocsr()
+
+
+def cosine_similarity(X, Y):
+    """Dense (rows of X, rows of Y) matrix of cosine similarities between two sparse matrices."""
+    return (l2_normalize(X) @ l2_normalize(Y).T).toarray()
+
+
+def _count_matrix(texts, analyzer, vocabulary=None):
+    """
+    Raw term counts as a CSR matrix (one row per text, from any iterable of
+    texts, consumed once) and the vocabulary (term -> column). With a given vocabulary, terms outside it are ignored;
+    otherwise every term gets a column in order of first appearance.
+    """
+    columns = []
+    indptr = [0]
+    if vocabulary is None:
+        # A missing term gets the next column without leaving C code
+        vocabulary = defaultdict()
+        vocabulary.default_factory = vocabulary.__len__
+        column_of = vocabulary.__getitem__
+        for text in texts:
+            columns.extend(map(column_of, analyzer(text)))
+            indptr.append(len(columns))
+        vocabulary = dict(vocabulary)
+    else:
+        get = vocabulary.get
+        for text in texts:
+            columns.extend([col for col in map(get, analyzer(text)) if col is not None])
+            indptr.append(len(columns))
+    columns = np.asarray(columns, dtype=np.int64)
+    counts = sp.csr_matrix((np.ones(len(columns), dtype=np.int64), columns, np.asarray(indptr, dtype=np.int64)),
+                           shape=(len(indptr) - 1, len(vocabulary)))
+    counts.sum_duplicates()
+    return counts, vocabulary
+
+
+class TfidfVectorizer:
+    """
+    TF-IDF features on NumPy/SciPy sparse arrays: the part of scikit-learn's
+    TfidfVectorizer this project uses (analyzer above, raw term counts, smoothed
+    IDF, L2-normalized rows, and a max_features cap on the most frequent
+    terms), giving the same vectors. Columns are in alphabetical term order.
+    """
+
+    def __init__(self, max_features=None, analyzer=None):
+        self.max_features = max_features
+        self.analyzer = analyzer or build_analyzer()
+        self.vocabulary_ = None
+        self.idf_ = None
+
+    def fit_transform(self, texts):
+        counts, vocabulary = _count_matrix(texts, self.analyzer)
+        if not vocabulary:
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        terms = sorted(vocabulary)
+        order = np.fromiter((vocabulary[term] for term in terms), dtype=np.int64, count=len(terms))
+        if self.max_features is not None and len(terms) > self.max_features:
+            # Keep the most frequent terms. The default (unstable) argsort on the
+            # same int64 totals breaks ties at the cut exactly as scikit-learn does
+            term_totals = np.asarray(counts.sum(axis=0)).ravel()[order]
+            keep = np.sort((-term_totals).argsort()[:self.max_features])
+            order = order[keep]
+            terms = [terms[i] for i in keep]
+        counts = counts[:, order]
+        doc_freq = np.bincount(counts.indices, minlength=len(terms))
+        self.idf_ = np.log((1 + counts.shape[0]) / (1 + doc_freq)) + 1.0
+        self.vocabulary_ = {term: col for col, term in enumerate(terms)}
+        return l2_normalize(counts.multiply(self.idf_))
+
+    def transform(self, texts):
+        counts, _ = _count_matrix(texts, self.analyzer, self.vocabulary_)
+        return l2_normalize(counts.multiply(self.idf_))
+
+
+class HashingVectorizer:
+    """
+    Stateless unigram+bigram features hashed into `n_features` columns (CRC32
+    of the UTF-8 term), with L2-normalized term frequencies per row. Needs no
+    vocabulary, so any chunk of texts can be vectorized on its own.
+    """
+
+    def __init__(self, n_features=2 ** 20, analyzer=None):
+        self.n_features = n_features
+        self.analyzer = analyzer or build_analyzer()
+
+    def transform(self, texts):
+        crc32 = zlib.crc32
+        n_features = self.n_features
+        columns = []
+        indptr = [0]
+        for text in texts:
+            columns.extend([crc32(term.encode('utf-8')) % n_features for term in self.analyzer(text)])
+            indptr.append(len(columns))
+        counts = sp.csr_matrix((np.ones(len(columns)), np.asarray(columns, dtype=np.int64),
+                                np.asarray(indptr, dtype=np.int64)), shape=(len(indptr) - 1, self.n_features))
+        counts.sum_duplicates()
+        return l2_normalize(counts)